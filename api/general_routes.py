@@ -1,74 +1,32 @@
 from fastapi import APIRouter, UploadFile, File, HTTPException
-from pathlib import Path
-from core.integrations.rag_adapter import rag_add_document, rag_search
-import asyncio
-import pdfplumber
+from fastapi.responses import JSONResponse
+from core.integrations.rag_adapter import rag_search
+from core.executors import run_io
+from api.uploads import store_upload, enqueue_unless_known
 router = APIRouter(prefix="/general", tags=["general"])
 
-UPLOAD_DIR = Path("uploads/general")
-UPLOAD_DIR.mkdir(parents=True, exist_ok=True)
-
-
-@router.post("/upload")
+@router.post("/upload", status_code=202)
 async def upload_general(file: UploadFile = File(...)):
     try:
-        content = await file.read()
-        path = UPLOAD_DIR / file.filename
-        path.write_bytes(content)
-        
+        stored = await store_upload(file, "general")
+
         # Για μεγάλα PDFs, απλά αποθήκευση χωρίς processing
-        file_size_mb = len(content) / (1024 * 1024)
+        file_size_mb = stored["size"] / (1024 * 1024)
         if file_size_mb > 5:
-            return {
-                "status": "warning",
-                "filename": file.filename,
-                "message": "File saved but RAG processing skipped (too large)"
-            }
-        
-        text = ""  # <-- ΠΡΟΣΘΗΚΗ ΑΥΤΗΣ ΤΗΣ ΓΡΑΜΜΗΣ
-        
-        # Αν είναι PDF, χρησιμοποίησε pdfplumber
-        if file.filename.lower().endswith('.pdf'):
-            try:
-                with pdfplumber.open(path) as pdf:
-                    for page in pdf.pages:
-                        page_text = page.extract_text()
-                        if page_text:
-                            text += page_text + "\n"
-                print(f"📄 PDF extracted {len(text)} characters")
-            except Exception as e:
-                print(f"PDF extraction error: {e}")
-                text = "PDF extraction failed"
-        else:
-            # Για txt αρχεία
-            try:
-                text = content.decode("utf-8", errors="ignore")
-            except Exception:
-                text = ""
-
-        # Αν το κείμενο είναι πολύ μικρό, προειδοποίηση
-        if len(text.strip()) < 10:
-            return {
-                "status": "warning",
-                "message": f"Little or no text extracted from file",
-                "filename": file.filename,
-                "text_preview": text[:200] if text else ""
-            }
+            return JSONResponse(
+                status_code=200,
+                content={
+                    "status": "warning",
+                    "filename": file.filename,
+                    "message": "File saved but RAG processing skipped (too large)"
+                }
+            )
 
-        # Προσθήκη στο RAG
-        rag_result = rag_add_document(
-            text=text,
-            metadata={"filename": file.filename, "type": "general"},
-            collection="general"
-        )
-
-        return {
-            "status": "ok",
-            "filename": file.filename,
-            "text_length": len(text),
-            "rag_result": rag_result
-        }
+        # Εξαγωγή κειμένου + RAG στο background job queue, εκτός αν είναι ήδη indexed
+        return await enqueue_unless_known(stored, "general", "general")
 
+    except HTTPException:
+        raise
     except Exception as e:
         return {
             "status": "error",
@@ -79,8 +37,9 @@ async def upload_general(file: UploadFile = File(...)):
 async def search_general(query: dict):
     q = query.get("query")
     top_k = query.get("top_k", 3)
+    filters = query.get("filters")
 
-    results = rag_search(q, collection="general", top_k=top_k)
+    results = await run_io(rag_search, q, collection="general", top_k=top_k, where=filters)
     return results
 
 
@@ -91,14 +50,14 @@ async def debug_rag():
     from core.integrations.rag_adapter import get_collection
     
     # Test 1: Basic search
-    test_result = rag_search("test", "general", 3)
+    test_result = await run_io(rag_search, "test", "general", 3)
     
     # Test 2: Check collection
-    col = get_collection("general")
-    count = col.count()
+    col = await run_io(get_collection, "general")
+    count = await run_io(col.count)
     
     # Check what's in the collection
-    sample = col.peek() if hasattr(col, 'peek') else {}
+    sample = await run_io(col.peek) if hasattr(col, 'peek') else {}
     
     return {
         "rag_search_result": test_result,
@@ -1,56 +1,19 @@
 from fastapi import APIRouter, UploadFile, File, HTTPException
-from pathlib import Path
-import asyncio
+from typing import Optional
 
-from core.ocr.invoice_ocr import ocr_to_text
-from core.integrations.rag_adapter import rag_add_document
-from core.invoice.parser import parse_invoice_text
+from api.uploads import store_upload, enqueue_unless_known
+from core.executors import run_io
 
 router = APIRouter(prefix="/invoices", tags=["invoices"])
 
-UPLOAD_DIR = Path("uploads/invoices")
-UPLOAD_DIR.mkdir(parents=True, exist_ok=True)
-
-
-@router.post("/upload")
-async def upload_invoice(file: UploadFile = File(...)):
+@router.post("/upload", status_code=202)
+async def upload_invoice(file: UploadFile = File(...), preprocess: Optional[bool] = None):
     try:
-        # Timeout protection for reading the file
-        try:
-            content = await asyncio.wait_for(file.read(), timeout=30.0)
-        except asyncio.TimeoutError:
-            raise HTTPException(status_code=408, detail="Upload timeout")
-
-        # Save file
-        path = UPLOAD_DIR / file.filename
-        path.write_bytes(content)
-
-        # OCR
-        text = ocr_to_text(str(path), file.filename)
-
-        if len(text.strip()) < 20:
-            return {
-                "status": "error",
-                "message": "OCR failed: too little text",
-                "ocr_preview": text
-            }
+        # Stream στο blob store + sha256 (408 σε timeout)
+        stored = await store_upload(file, "invoices")
 
-        # Store in RAG
-        rag_add_document(
-            text=text,
-            metadata={"filename": file.filename, "type": "invoice"},
-            collection="invoices"
-        )
-
-        # Parse
-        parsed = parse_invoice_text(text)
-
-        return {
-            "status": "ok",
-            "filename": file.filename,
-            "ocr_preview": text[:2000],
-            "parsed_invoice": parsed
-        }
+        # OCR → RAG → parse στο background job queue, εκτός αν το περιεχόμενο είναι ήδη γνωστό
+        return await enqueue_unless_known(stored, "invoices", "invoice", {"preprocess": preprocess})
 
     except HTTPException:
         raise
@@ -68,5 +31,6 @@ async def search_invoice(query: dict):
 
     q = query.get("query")
     top_k = query.get("top_k", 3)
+    filters = query.get("filters")
 
-    return rag_search(q, collection="invoices", top_k=top_k)
\ No newline at end of file
+    return await run_io(rag_search, q, collection="invoices", top_k=top_k, where=filters)
\ No newline at end of file
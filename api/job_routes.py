@@ -0,0 +1,35 @@
+from fastapi import APIRouter, HTTPException
+
+from core.executors import run_io
+from core.jobs.queue import job_queue
+
+router = APIRouter(prefix="/jobs", tags=["jobs"])
+
+def job_view(job: dict) -> dict:
+    return {
+        "job_id": job["id"],
+        "kind": job["kind"],
+        "status": job["status"],
+        "filename": job["payload"].get("filename"),
+        "attempts": job["attempts"],
+        "max_attempts": job["max_attempts"],
+        "stages": job["progress"],
+        "result": job["result"],
+        "error": job["error"],
+        "created_at": job["created_at"],
+        "updated_at": job["updated_at"],
+    }
+
+
+@router.get("/{job_id}")
+async def get_job(job_id: str):
+    job = await run_io(job_queue.get, job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Job not found")
+    return job_view(job)
+
+
+@router.get("")
+async def list_jobs(limit: int = 50, status: str = None):
+    jobs = await run_io(job_queue.list, limit, status)
+    return {"jobs": [job_view(j) for j in jobs]}
@@ -5,9 +5,22 @@ from fastapi.responses import JSONResponse
 import time
 import asyncio
 
+from core.executors import run_io, shutdown_executors
+from core.jobs.queue import JobWorkerPool, job_queue
+from core.ocr import ocr_cache, tesseract_pool
+from core.invoice.parser import parse_cache, template_store
+from core.pipelines import JOB_HANDLERS
+from core.integrations.rag_adapter import (
+    embedding_cache,
+    query_embedding_cache,
+    search_result_cache,
+)
+
 # Import routers
 from api.general_routes import router as general_router
 from api.invoice_routes import router as invoice_router
+from api.search_routes import router as search_router
+from api.job_routes import router as job_router
 
 app = FastAPI(
     title="AInteG Backend API",
@@ -63,6 +76,21 @@ app.add_middleware(
 # Include routers (αυτά είναι τα πραγματικά endpoints)
 app.include_router(general_router)
 app.include_router(invoice_router)
+app.include_router(search_router)
+app.include_router(job_router)
+
+# Background ingestion workers
+job_workers = JobWorkerPool(job_queue, JOB_HANDLERS)
+
+@app.on_event("startup")
+def start_job_workers():
+    job_workers.start()
+
+@app.on_event("shutdown")
+def stop_executors():
+    job_workers.stop()
+    shutdown_executors()
+    tesseract_pool.close_pool()
 
 # Health endpoints
 @app.get("/")
@@ -71,13 +99,33 @@ async def root():
         "message": "AInteG Backend API", 
         "status": "running",
         "version": "1.0.0",
-        "endpoints": ["/general", "/invoices", "/docs", "/health"]
+        "endpoints": ["/general", "/invoices", "/search", "/jobs", "/docs", "/health", "/cache/stats"]
     }
 
 @app.get("/health")
 async def health():
     return {"status": "ok", "timestamp": time.time()}
 
+def _collect_cache_stats() -> dict:
+    return {
+        "embeddings": embedding_cache.stats(),
+        "query_embeddings": query_embedding_cache.stats(),
+        "search_results": search_result_cache.stats(),
+        "ocr": ocr_cache.ocr_cache.stats(),
+        "invoice_parse": parse_cache.stats(),
+        "supplier_templates": template_store.stats(),
+    }
+
+# SQLite stats/DELETE στο io pool, όχι στο event loop
+@app.get("/cache/stats")
+async def cache_stats():
+    return await run_io(_collect_cache_stats)
+
+@app.delete("/cache/ocr")
+async def purge_ocr_cache(content_hash: str = None):
+    removed = await run_io(ocr_cache.purge, content_hash)
+    return {"status": "ok", "removed": removed}
+
 if __name__ == "__main__":
     import uvicorn
     print("🚀 Starting AInteG Backend on http://127.0.0.1:8001")
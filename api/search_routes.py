@@ -0,0 +1,49 @@
+from fastapi import APIRouter, HTTPException
+
+from core.executors import run_io
+from core.integrations.rag_adapter import rag_search_batch, rag_search_federated
+from models.rag_models import BatchSearchRequest, FederatedSearchRequest
+
+router = APIRouter(prefix="/search", tags=["search"])
+
+SEARCHABLE_COLLECTIONS = ("general", "invoices")
+MAX_BATCH_QUERIES = 256
+
+
+@router.post("/batch")
+async def search_batch(request: BatchSearchRequest):
+    """Many queries in one request: one embeddings call, one Chroma query per collection."""
+    if len(request.queries) > MAX_BATCH_QUERIES:
+        raise HTTPException(status_code=400, detail=f"Max {MAX_BATCH_QUERIES} queries per batch")
+
+    for q in request.queries:
+        if q.collection not in SEARCHABLE_COLLECTIONS:
+            raise HTTPException(status_code=400, detail=f"Unknown collection: {q.collection}")
+
+    queries = [q.model_dump() if hasattr(q, "model_dump") else q.dict() for q in request.queries]
+    results = await run_io(rag_search_batch, queries)
+
+    return {
+        "status": "ok",
+        "results": [
+            {"query": q["query"], "collection": q["collection"], **res}
+            for q, res in zip(queries, results)
+        ]
+    }
+
+
+@router.post("/federated")
+async def search_federated(request: FederatedSearchRequest):
+    """One query across several collections, merged by normalized score."""
+    collections = list(dict.fromkeys(request.collections))
+    for name in collections:
+        if name not in SEARCHABLE_COLLECTIONS:
+            raise HTTPException(status_code=400, detail=f"Unknown collection: {name}")
+
+    return await run_io(
+        rag_search_federated,
+        request.query,
+        collections,
+        top_k=request.top_k,
+        where=request.filters,
+    )
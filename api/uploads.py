@@ -0,0 +1,130 @@
+# api/uploads.py
+import os
+import hashlib
+import asyncio
+from pathlib import Path
+
+from fastapi import UploadFile, HTTPException
+from fastapi.responses import JSONResponse
+
+from core.executors import run_io
+from core.jobs.queue import job_queue
+from core.storage.blob_store import blob_store, blob_catalog, document_id_for
+
+# ----------------------------------------
+# Streaming upload → disk (σταθερή μνήμη ανά upload)
+# ----------------------------------------
+UPLOAD_BLOCK_SIZE = int(os.getenv("UPLOAD_BLOCK_SIZE", str(1024 * 1024)))
+UPLOAD_READ_TIMEOUT = float(os.getenv("UPLOAD_READ_TIMEOUT", "30"))
+
+
+async def save_upload(file: UploadFile, path: Path, block_size: int = UPLOAD_BLOCK_SIZE) -> dict:
+    """
+    Stream an upload to `path` block by block, hashing as it goes.
+
+    At most one block is held in memory. The file is written to a
+    temporary name and renamed into place, so readers never see a partial
+    file. Returns {"path", "size", "content_hash"} (sha256 hex).
+    """
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp_path = path.with_name(f".{path.name}.part")
+    digest = hashlib.sha256()
+    size = 0
+
+    out = await run_io(open, tmp_path, "wb")
+    try:
+        while True:
+            try:
+                block = await asyncio.wait_for(file.read(block_size), timeout=UPLOAD_READ_TIMEOUT)
+            except asyncio.TimeoutError:
+                raise HTTPException(status_code=408, detail="Upload timeout")
+            if not block:
+                break
+            digest.update(block)
+            size += len(block)
+            await run_io(out.write, block)
+    except BaseException:
+        await run_io(out.close)
+        tmp_path.unlink(missing_ok=True)
+        raise
+
+    await run_io(out.close)
+    await run_io(os.replace, tmp_path, path)
+    return {"path": str(path), "size": size, "content_hash": digest.hexdigest()}
+
+
+# ----------------------------------------
+# Content-addressed ingestion
+# ----------------------------------------
+_ingest_lock = asyncio.Lock()
+
+
+async def store_upload(file: UploadFile, kind: str) -> dict:
+    """
+    Stream an upload into the blob store and record its name in the
+    catalog. Returns {"path" (blob), "size", "content_hash", "filename"}.
+    """
+    saved = await save_upload(file, blob_store.tmp_path())
+    content_hash = saved["content_hash"]
+    blob_path = await run_io(blob_store.put, Path(saved["path"]), content_hash)
+    await run_io(blob_catalog.record_name, kind, file.filename, content_hash, saved["size"])
+    await run_io(blob_store.link_name, content_hash, kind, file.filename)
+    return {"path": str(blob_path), "size": saved["size"],
+            "content_hash": content_hash, "filename": file.filename}
+
+
+def _duplicate_response(doc: dict, stored: dict) -> JSONResponse:
+    content = {
+        "status": "duplicate",
+        "document_id": doc["document_id"],
+        "content_hash": stored["content_hash"],
+        "filename": stored["filename"],
+        "indexed": doc["status"] == "indexed",
+        "chunks": doc.get("chunks"),
+    }
+    if doc.get("job_id"):
+        content.update(job_id=doc["job_id"], status_url=f"/jobs/{doc['job_id']}")
+    return JSONResponse(status_code=200, content=content)
+
+
+async def enqueue_unless_known(stored: dict, collection: str, job_kind: str,
+                               payload: dict = None) -> JSONResponse:
+    """
+    Queue the ingestion job, unless this content is already indexed in
+    `collection` or an ingestion job for it is still alive — then the
+    existing document id (and job) is returned, with no OCR/embedding work.
+    A job that failed, or finished without indexing anything, is retried.
+    """
+    content_hash = stored["content_hash"]
+    async with _ingest_lock:
+        doc = await run_io(blob_catalog.get_document, content_hash, collection)
+        if doc is not None:
+            job = await run_io(job_queue.get, doc["job_id"]) if doc.get("job_id") else None
+            # Αποτυχημένο job, ή job που τελείωσε χωρίς index (π.χ. OCR χωρίς κείμενο)
+            # → ξανά (το index stage παρακάμπτεται αν έγινε ήδη)
+            failed = job is not None and (
+                job["status"] == "failed"
+                or (job["status"] == "done" and doc["status"] != "indexed")
+            )
+            if not failed and (doc["status"] == "indexed" or job is not None):
+                return _duplicate_response(doc, stored)
+
+        document_id = document_id_for(content_hash)
+        job_id = await run_io(
+            job_queue.enqueue,
+            job_kind,
+            {"path": stored["path"], "filename": stored["filename"],
+             "content_hash": content_hash, "document_id": document_id, **(payload or {})}
+        )
+        await run_io(blob_catalog.mark_pending, content_hash, collection, document_id, job_id)
+
+    return JSONResponse(
+        status_code=202,
+        content={
+            "status": "queued",
+            "job_id": job_id,
+            "document_id": document_id,
+            "filename": stored["filename"],
+            "status_url": f"/jobs/{job_id}"
+        }
+    )
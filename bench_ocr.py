@@ -0,0 +1,84 @@
+# bench_ocr.py
+"""
+OCR benchmark: Tesseract time and score_text with and without the
+NumPy preprocessing stage. Bypasses the OCR cache.
+
+Usage:
+    python bench_ocr.py invoice1.pdf photo.jpg [--dpi 200] [--max-pages 5]
+"""
+import io
+import argparse
+import time
+from pathlib import Path
+
+import fitz
+from PIL import Image
+
+from core.ocr.invoice_ocr import (
+    TESSERACT_LANG,
+    TESSERACT_DPI,
+    preprocess_image,
+    render_pages,
+    score_text,
+)
+from core.ocr import tesseract_pool
+
+
+def load_images(path: Path, dpi: int, max_pages: int):
+    """(label, PIL image) for every page of a PDF or a single image file."""
+    if path.suffix.lower() == ".pdf":
+        with fitz.open(path) as pdf:
+            count = min(max_pages, len(pdf))
+            for page in render_pages(pdf, range(count), dpi):
+                # copy(): το raster ζει μόνο όσο το pixmap
+                yield f"{path.name} p{page.page_num + 1}", page.image().copy()
+    else:
+        yield path.name, Image.open(io.BytesIO(path.read_bytes()))
+
+
+def run_tesseract(img: Image.Image):
+    start = time.perf_counter()
+    text = tesseract_pool.image_to_string(img, TESSERACT_LANG)
+    return time.perf_counter() - start, text
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Preprocessing before/after OCR benchmark")
+    parser.add_argument("files", nargs="+")
+    parser.add_argument("--dpi", type=int, default=TESSERACT_DPI)
+    parser.add_argument("--max-pages", type=int, default=5)
+    args = parser.parse_args()
+
+    print(f"Tesseract backend: {tesseract_pool.backend_name()}")
+    header = f"{'page':<32} {'raw s':>7} {'raw score':>9} {'prep s':>7} {'ocr s':>7} {'pp score':>9}"
+    print(header)
+    print("-" * len(header))
+
+    totals = {"raw": 0.0, "prep": 0.0, "pp_ocr": 0.0, "raw_score": 0.0, "pp_score": 0.0, "n": 0}
+    for name in args.files:
+        for label, img in load_images(Path(name), args.dpi, args.max_pages):
+            raw_s, raw_text = run_tesseract(img)
+
+            start = time.perf_counter()
+            prepared = preprocess_image(img)
+            prep_s = time.perf_counter() - start
+            pp_s, pp_text = run_tesseract(prepared)
+
+            raw_score, pp_score = score_text(raw_text), score_text(pp_text)
+            print(f"{label[:32]:<32} {raw_s:7.2f} {raw_score:9.3f} {prep_s:7.2f} {pp_s:7.2f} {pp_score:9.3f}")
+
+            totals["raw"] += raw_s
+            totals["prep"] += prep_s
+            totals["pp_ocr"] += pp_s
+            totals["raw_score"] += raw_score
+            totals["pp_score"] += pp_score
+            totals["n"] += 1
+
+    n = max(1, totals["n"])
+    print("-" * len(header))
+    print(f"{'TOTAL / mean score':<32} {totals['raw']:7.2f} {totals['raw_score'] / n:9.3f} "
+          f"{totals['prep']:7.2f} {totals['pp_ocr']:7.2f} {totals['pp_score'] / n:9.3f}")
+
+
+if __name__ == "__main__":
+    main()
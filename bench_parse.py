@@ -0,0 +1,172 @@
+# bench_parse.py
+"""
+Prompt compaction check: parse each fixture with the full OCR text and
+with compact_invoice_text(), compare the extracted fields and report the
+token estimates. Calls the LLM directly (no parse cache, no regex tier).
+
+Fixtures are OCR text files; a sibling <name>.json with the expected
+fields is compared against too when present.
+
+--offline makes no LLM calls: it checks that every expected value and
+every field-labelled line of the full text survive compaction, and that
+every field the regex tier would return without the LLM matches the
+expected value (a wrong confident regex field is a regression).
+
+Usage:
+    python bench_parse.py fixtures/*.txt
+    python bench_parse.py --offline fixtures/*.txt
+"""
+import json
+import argparse
+from pathlib import Path
+
+from core.invoice.parser import (
+    AMOUNT_RE,
+    FIELD_LABEL_RES,
+    HEADER_FIELDS,
+    TOTAL_FIELDS,
+    compact_invoice_text,
+    fast_parse,
+    fast_value,
+    fold_accents,
+    is_confident,
+    llm_parse,
+    needs_llm,
+    parse_amount,
+    prepare_prompt_text,
+)
+
+
+def field_values(parsed: dict) -> dict:
+    """Flat, comparable view of a parse result."""
+    values = {f: (str(parsed.get(f)).strip() if parsed.get(f) is not None else None)
+              for f in HEADER_FIELDS}
+    totals = parsed.get("totals") or {}
+    for f in TOTAL_FIELDS:
+        values[f] = parse_amount(totals.get(f))
+    products = parsed.get("products") or []
+    values["products"] = len(products)
+    values["lines_total"] = round(sum(parse_amount(p.get("line_total")) or 0 for p in products), 2)
+    return values
+
+
+def missing_after_compaction(text: str, expected: dict) -> list:
+    """Expected values and labelled lines present in `text` but not in its compacted form."""
+    compact = compact_invoice_text(text)
+    folded_full, folded_compact = fold_accents(text), fold_accents(compact)
+    amounts = {parse_amount(a) for a in AMOUNT_RE.findall(compact)}
+
+    missing = []
+    for f in HEADER_FIELDS:
+        value = expected.get(f)
+        if value is not None and fold_accents(str(value)) in folded_full \
+                and fold_accents(str(value)) not in folded_compact:
+            missing.append(f)
+    for f in TOTAL_FIELDS:
+        value = parse_amount((expected.get("totals") or {}).get(f))
+        if value is not None and value not in amounts:
+            missing.append(f)
+    for p in expected.get("products") or []:
+        if fold_accents(p["description"]) not in folded_compact:
+            missing.append(f"product '{p['description']}'")
+
+    kept = set(folded_compact.splitlines())
+    for line in text.splitlines():
+        line = fold_accents(" ".join(line.split()))
+        if any(rx.search(line) for rx in FIELD_LABEL_RES) and line not in kept:
+            missing.append(f"line '{line[:40]}'")
+    return missing
+
+
+def regex_tier_errors(text: str, expected: dict) -> list:
+    """Confident regex-tier fields that disagree with the expected values."""
+    fast = fast_parse(text)
+    got = field_values({**fast["data"], "products": fast["data"]["products"]})
+    want = field_values(expected)
+    errors = []
+    for f in HEADER_FIELDS + TOTAL_FIELDS:
+        if is_confident(fast, f) and got[f] != want[f]:
+            errors.append(f"{f}={got[f]!r} (expected {want[f]!r})")
+    if is_confident(fast, "products"):
+        for p, e in zip(fast_value(fast, "products"), expected.get("products") or []):
+            if p["description"] != e["description"]:
+                errors.append(f"product {p['description']!r} (expected {e['description']!r})")
+    if not needs_llm(fast):
+        # Χωρίς LLM: ό,τι λείπει από το regex tier λείπει και από το αποτέλεσμα
+        errors += [f"{f} missing" for f in HEADER_FIELDS + TOTAL_FIELDS
+                   if want[f] is not None and not is_confident(fast, f)]
+    return errors
+
+
+def offline(files: list) -> int:
+    failures = 0
+    for name in files:
+        path = Path(name)
+        text = path.read_text(encoding="utf-8")
+        expected_path = path.with_suffix(".json")
+        expected = json.loads(expected_path.read_text(encoding="utf-8")) if expected_path.exists() else {}
+        _, tokens = prepare_prompt_text(text, compact=True)
+        missing = missing_after_compaction(text, expected)
+        regex_errors = regex_tier_errors(text, expected) if expected else []
+        failures += bool(missing) + bool(regex_errors)
+        saved = 1 - tokens["after"] / max(1, tokens["before"])
+        print(f"{path.name[:32]:<32} {tokens['before']:6d} → {tokens['after']:6d} ({saved:.0%})  "
+              f"{'OK' if not missing else 'MISSING: ' + ', '.join(missing)}  "
+              f"regex tier: {'OK' if not regex_errors else 'WRONG: ' + '; '.join(regex_errors)}")
+    return failures
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Full vs compacted parse prompt comparison")
+    parser.add_argument("files", nargs="+")
+    parser.add_argument("--offline", action="store_true",
+                        help="no LLM calls; only check that compaction keeps every expected value")
+    args = parser.parse_args()
+
+    if args.offline:
+        raise SystemExit(1 if offline(args.files) else 0)
+
+    header = f"{'fixture':<32} {'tok full':>8} {'tok comp':>8} {'saved':>6} {'match':>6} {'diff fields'}"
+    print(header)
+    print("-" * len(header))
+
+    totals = {"full": 0, "compact": 0, "fields": 0, "matching": 0, "expected": 0, "expected_ok": 0}
+    for name in args.files:
+        path = Path(name)
+        text = path.read_text(encoding="utf-8")
+
+        full_text, full_tokens = prepare_prompt_text(text, compact=False)
+        compact_text, compact_tokens = prepare_prompt_text(text, compact=True)
+        full = field_values(llm_parse(full_text))
+        compact = field_values(llm_parse(compact_text))
+
+        diff = [f for f in full if full[f] != compact[f]]
+        matching = len(full) - len(diff)
+        saved = 1 - compact_tokens["after"] / max(1, full_tokens["after"])
+        print(f"{path.name[:32]:<32} {full_tokens['after']:8d} {compact_tokens['after']:8d} "
+              f"{saved:6.0%} {matching:3d}/{len(full):<2d} {', '.join(diff)}")
+
+        expected_path = path.with_suffix(".json")
+        if expected_path.exists():
+            expected = field_values(json.loads(expected_path.read_text(encoding="utf-8")))
+            for f, value in expected.items():
+                if value is None:
+                    continue
+                totals["expected"] += 2
+                totals["expected_ok"] += (full[f] == value) + (compact[f] == value)
+
+        totals["full"] += full_tokens["after"]
+        totals["compact"] += compact_tokens["after"]
+        totals["fields"] += len(full)
+        totals["matching"] += matching
+
+    print("-" * len(header))
+    saved = 1 - totals["compact"] / max(1, totals["full"])
+    print(f"{'TOTAL':<32} {totals['full']:8d} {totals['compact']:8d} {saved:6.0%} "
+          f"{totals['matching']}/{totals['fields']} fields identical")
+    if totals["expected"]:
+        print(f"Expected-field accuracy (both prompts): {totals['expected_ok']}/{totals['expected']}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,71 @@
+# bench_vision.py
+"""
+Vision tier benchmark: sends every page through the real Vision path
+(payload compaction, VISION_CONCURRENCY fan-out, shared rate limiter,
+retries) and reports wall time, throughput, failed pages and limiter
+state. Bypasses the OCR cache.
+
+Point it at vision_stub.py to exercise latency and 429s without tokens:
+    python vision_stub.py --port 8089 --latency 1.5 --rps 3
+    VISION_BASE_URL=http://127.0.0.1:8089/v1 python bench_vision.py invoice.pdf photo.jpg
+
+Usage:
+    python bench_vision.py invoice1.pdf photo.jpg [--max-pages 20] [--preprocess]
+"""
+import argparse
+import time
+from pathlib import Path
+
+import fitz
+
+from core.executors import VISION_CONCURRENCY
+from core.ocr import vision_client
+from core.ocr.invoice_ocr import VISION_MAX_PAGES, openai_ocr_pdf_pages
+
+
+def run_file(path: Path, max_pages: int, preprocess: bool) -> dict:
+    start = time.perf_counter()
+    if path.suffix.lower() == ".pdf":
+        with fitz.open(path) as pdf:
+            count = min(max_pages, len(pdf))
+            texts = list(openai_ocr_pdf_pages(pdf, range(count), preprocess).values())
+    else:
+        texts = [vision_client.vision_ocr(path.read_bytes())]
+    return {
+        "pages": len(texts),
+        "failed": sum(1 for t in texts if not t),
+        "seconds": time.perf_counter() - start,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Vision OCR throughput under the rate limiter")
+    parser.add_argument("files", nargs="+")
+    parser.add_argument("--max-pages", type=int, default=VISION_MAX_PAGES)
+    parser.add_argument("--preprocess", action="store_true")
+    args = parser.parse_args()
+
+    endpoint = vision_client.VISION_BASE_URL or "OpenAI"
+    print(f"Vision endpoint: {endpoint} (concurrency {VISION_CONCURRENCY}, "
+          f"rate {vision_client.VISION_RATE}/s, burst {vision_client.VISION_BURST})")
+    header = f"{'file':<32} {'pages':>5} {'failed':>6} {'seconds':>8} {'pages/s':>8}"
+    print(header)
+    print("-" * len(header))
+
+    totals = {"pages": 0, "failed": 0, "seconds": 0.0}
+    for name in args.files:
+        path = Path(name)
+        result = run_file(path, args.max_pages, args.preprocess)
+        for key in totals:
+            totals[key] += result[key]
+        print(f"{path.name[:32]:<32} {result['pages']:5d} {result['failed']:6d} "
+              f"{result['seconds']:8.2f} {result['pages'] / max(result['seconds'], 1e-9):8.2f}")
+
+    print("-" * len(header))
+    print(f"{'TOTAL':<32} {totals['pages']:5d} {totals['failed']:6d} {totals['seconds']:8.2f} "
+          f"{totals['pages'] / max(totals['seconds'], 1e-9):8.2f}")
+    print(f"Limiter: {vision_client.limiter.stats()}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,156 @@
+import os
+import sqlite3
+import threading
+import time
+from pathlib import Path
+
+# ----------------------------------------
+# Cache location (κοινό για όλα τα caches)
+# ----------------------------------------
+CACHE_DIR = Path(os.getenv("CACHE_DIR", "./cache"))
+
+
+# ----------------------------------------
+# SQLite-backed LRU cache
+# ----------------------------------------
+class DiskLRUCache:
+    """
+    Persistent key → bytes cache stored in a single SQLite file.
+
+    Entries are evicted least-recently-used first once the total stored
+    value size exceeds `max_bytes`. Hit/miss counters are kept per process.
+    """
+
+    def __init__(self, filename: str, max_bytes: int):
+        CACHE_DIR.mkdir(parents=True, exist_ok=True)
+        self.path = CACHE_DIR / filename
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._lock = threading.Lock()
+
+        self._conn = sqlite3.connect(str(self.path), check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS entries ("
+            " key TEXT PRIMARY KEY,"
+            " value BLOB NOT NULL,"
+            " size INTEGER NOT NULL,"
+            " accessed REAL NOT NULL)"
+        )
+        self._conn.execute(
+            "CREATE INDEX IF NOT EXISTS idx_entries_accessed ON entries(accessed)"
+        )
+        self._conn.commit()
+
+        row = self._conn.execute("SELECT COALESCE(SUM(size), 0) FROM entries").fetchone()
+        self._total_bytes = row[0]
+
+    def get(self, key: str):
+        return self.get_many([key]).get(key)
+
+    def get_many(self, keys: list) -> dict:
+        """Return {key: value} for the keys found, touching their LRU timestamp."""
+        found = {}
+        unique = list(dict.fromkeys(keys))
+        if not unique:
+            return found
+
+        with self._lock:
+            # SQLite έχει όριο παραμέτρων ανά query
+            for start in range(0, len(unique), 500):
+                part = unique[start:start + 500]
+                marks = ",".join("?" * len(part))
+                rows = self._conn.execute(
+                    f"SELECT key, value FROM entries WHERE key IN ({marks})", part
+                ).fetchall()
+                found.update(rows)
+
+            if found:
+                now = time.time()
+                self._conn.executemany(
+                    "UPDATE entries SET accessed = ? WHERE key = ?",
+                    [(now, k) for k in found]
+                )
+                self._conn.commit()
+
+            self.hits += len(found)
+            self.misses += len(unique) - len(found)
+
+        return found
+
+    def set(self, key: str, value: bytes):
+        self.set_many({key: value})
+
+    def set_many(self, items: dict):
+        if not items:
+            return
+
+        with self._lock:
+            now = time.time()
+            for key, value in items.items():
+                old = self._conn.execute(
+                    "SELECT size FROM entries WHERE key = ?", (key,)
+                ).fetchone()
+                if old:
+                    self._total_bytes -= old[0]
+                self._conn.execute(
+                    "INSERT OR REPLACE INTO entries (key, value, size, accessed) "
+                    "VALUES (?, ?, ?, ?)",
+                    (key, value, len(value), now)
+                )
+                self._total_bytes += len(value)
+
+            self._evict()
+            self._conn.commit()
+
+    def _evict(self):
+        """Drop least-recently-used entries until we are under max_bytes."""
+        while self._total_bytes > self.max_bytes:
+            rows = self._conn.execute(
+                "SELECT key, size FROM entries ORDER BY accessed ASC LIMIT 100"
+            ).fetchall()
+            if not rows:
+                self._total_bytes = 0
+                break
+            for key, size in rows:
+                self._conn.execute("DELETE FROM entries WHERE key = ?", (key,))
+                self._total_bytes -= size
+                self.evictions += 1
+                if self._total_bytes <= self.max_bytes:
+                    break
+
+    def delete_prefix(self, prefix: str) -> int:
+        """Remove every entry whose key starts with `prefix`; returns the count."""
+        args = (len(prefix), prefix)
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT COUNT(*), COALESCE(SUM(size), 0) FROM entries WHERE substr(key, 1, ?) = ?",
+                args
+            ).fetchone()
+            self._conn.execute("DELETE FROM entries WHERE substr(key, 1, ?) = ?", args)
+            self._conn.commit()
+            self._total_bytes -= row[1]
+        return row[0]
+
+    def clear(self):
+        with self._lock:
+            self._conn.execute("DELETE FROM entries")
+            self._conn.commit()
+            self._total_bytes = 0
+
+    def stats(self) -> dict:
+        with self._lock:
+            entries = self._conn.execute("SELECT COUNT(*) FROM entries").fetchone()[0]
+        lookups = self.hits + self.misses
+        return {
+            "path": str(self.path),
+            "entries": entries,
+            "bytes": self._total_bytes,
+            "max_bytes": self.max_bytes,
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "hit_ratio": round(self.hits / lookups, 4) if lookups else 0.0,
+        }
@@ -0,0 +1,54 @@
+import os
+import asyncio
+import functools
+import multiprocessing
+import threading
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor
+
+# ----------------------------------------
+# Bounded executors για blocking δουλειά
+# ----------------------------------------
+# io:  OpenAI / Chroma calls, file writes (network & disk bound)
+# vision: fan-out των σελίδων προς OpenAI Vision (global όριο ταυτόχρονων requests)
+# cpu: pure-Python parsing (pdfplumber) σε ξεχωριστά processes λόγω GIL
+IO_WORKERS = int(os.getenv("IO_WORKERS", "16"))
+VISION_CONCURRENCY = int(os.getenv("VISION_CONCURRENCY", "4"))
+CPU_WORKERS = int(os.getenv("CPU_WORKERS", str(os.cpu_count() or 2)))
+
+io_executor = ThreadPoolExecutor(max_workers=IO_WORKERS, thread_name_prefix="io")
+vision_executor = ThreadPoolExecutor(max_workers=VISION_CONCURRENCY, thread_name_prefix="vision")
+
+_cpu_executor = None
+_cpu_lock = threading.Lock()
+
+
+def get_cpu_executor() -> ProcessPoolExecutor:
+    """Process pool, created on first use (spawn: ασφαλές με ενεργά threads)."""
+    global _cpu_executor
+    with _cpu_lock:
+        if _cpu_executor is None:
+            _cpu_executor = ProcessPoolExecutor(
+                max_workers=CPU_WORKERS,
+                mp_context=multiprocessing.get_context("spawn"),
+            )
+        return _cpu_executor
+
+
+async def _run(executor, func, *args, **kwargs):
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(executor, functools.partial(func, *args, **kwargs))
+
+
+async def run_io(func, *args, **kwargs):
+    """Run a blocking network/disk call without blocking the event loop."""
+    return await _run(io_executor, func, *args, **kwargs)
+
+
+def shutdown_executors():
+    global _cpu_executor
+    io_executor.shutdown(wait=False, cancel_futures=True)
+    vision_executor.shutdown(wait=False, cancel_futures=True)
+    with _cpu_lock:
+        if _cpu_executor is not None:
+            _cpu_executor.shutdown(wait=False, cancel_futures=True)
+            _cpu_executor = None
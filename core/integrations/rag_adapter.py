@@ -1,5 +1,12 @@
 import os
+import json
+import time
+import threading
 import uuid
+from concurrent.futures import ThreadPoolExecutor
+import hashlib
+import unicodedata
+from array import array
 from pathlib import Path
 
 import chromadb
@@ -8,6 +15,10 @@ from openai import OpenAI
 
 from dotenv import load_dotenv
 
+from core.cache.disk_cache import DiskLRUCache
+from core.cache.memory_cache import TTLCache
+from core.integrations.tokens import estimate_tokens
+
 # ----------------------------------------
 # Load .env
 # ----------------------------------------
@@ -18,6 +29,20 @@ OPENAI_KEY = os.getenv("OPENAI_API_KEY")
 EMBED_MODEL = os.getenv("EMBEDDING_MODEL", "text-embedding-3-small")
 CHROMA_DIR = os.getenv("CHROMA_DB_DIR", "./chroma_db")
 
+# Batching των embeddings (ένα embeddings.create ανά batch)
+EMBED_BATCH_SIZE = int(os.getenv("EMBED_BATCH_SIZE", "64"))
+EMBED_BATCH_MAX_TOKENS = int(os.getenv("EMBED_BATCH_MAX_TOKENS", "200000"))
+EMBED_MAX_RETRIES = int(os.getenv("EMBED_MAX_RETRIES", "3"))
+EMBED_RETRY_BACKOFF = float(os.getenv("EMBED_RETRY_BACKOFF", "1.0"))
+
+# Persistent embedding cache (float32 vectors, LRU eviction)
+EMBED_CACHE_MAX_MB = int(os.getenv("EMBED_CACHE_MAX_MB", "512"))
+
+# In-memory caches για τα search requests
+QUERY_CACHE_SIZE = int(os.getenv("QUERY_CACHE_SIZE", "1024"))
+SEARCH_CACHE_SIZE = int(os.getenv("SEARCH_CACHE_SIZE", "2048"))
+SEARCH_CACHE_TTL = float(os.getenv("SEARCH_CACHE_TTL", "600"))
+
 client = OpenAI(api_key=OPENAI_KEY)
 
 # ----------------------------------------
@@ -55,16 +80,168 @@ def get_collection(name: str):
         )
 
 
+# ----------------------------------------
+# Embedding cache
+# ----------------------------------------
+embedding_cache = DiskLRUCache("embeddings.sqlite3", EMBED_CACHE_MAX_MB * 1024 * 1024)
+
+
+def normalize_text(text: str) -> str:
+    """Unicode NFC + collapsed whitespace, so trivially different chunks share a key."""
+    return " ".join(unicodedata.normalize("NFC", text).split())
+
+
+def embedding_key(text: str) -> str:
+    """Content-addressed key; the model name is part of it so a model change invalidates."""
+    payload = f"{EMBED_MODEL}\x00{normalize_text(text)}".encode("utf-8")
+    return hashlib.sha256(payload).hexdigest()
+
+
+# ----------------------------------------
+# Search caches (in-memory, per process)
+# ----------------------------------------
+# Level 1: normalized query → embedding
+query_embedding_cache = TTLCache(QUERY_CACHE_SIZE, SEARCH_CACHE_TTL)
+# Level 2: (collection, generation, query, top_k, filters) → results
+search_result_cache = TTLCache(SEARCH_CACHE_SIZE, SEARCH_CACHE_TTL)
+
+_generations = {}
+_generations_lock = threading.Lock()
+
+
+def collection_generation(collection: str) -> int:
+    with _generations_lock:
+        return _generations.get(collection, 0)
+
+
+def bump_generation(collection: str) -> int:
+    """Invalidate cached search results of a collection after it changes."""
+    with _generations_lock:
+        _generations[collection] = _generations.get(collection, 0) + 1
+        return _generations[collection]
+
+
+def embed_query(query: str):
+    """Query embedding through the in-memory cache (falls back to embed())."""
+    key = normalize_text(query)
+    vector = query_embedding_cache.get(key)
+    if vector is None:
+        vector = embed(query)
+        query_embedding_cache.set(key, vector)
+    return vector
+
+
+def pack_vector(vector) -> bytes:
+    return array("f", vector).tobytes()
+
+
+def unpack_vector(blob: bytes) -> list:
+    vec = array("f")
+    vec.frombytes(blob)
+    return vec.tolist()
+
+
 # ----------------------------------------
 # Create embeddings
 # ----------------------------------------
 def embed(text: str):
-    """Generate an OpenAI embedding vector."""
+    """Generate an OpenAI embedding vector (cached on disk)."""
+    key = embedding_key(text)
+    cached = embedding_cache.get(key)
+    if cached is not None:
+        return unpack_vector(cached)
+
     resp = client.embeddings.create(
         input=text,
         model=EMBED_MODEL
     )
-    return resp.data[0].embedding
+    vector = resp.data[0].embedding
+    embedding_cache.set(key, pack_vector(vector))
+    return vector
+
+
+def make_embed_batches(texts: list, max_items: int = EMBED_BATCH_SIZE,
+                       max_tokens: int = EMBED_BATCH_MAX_TOKENS):
+    """Group text indexes into batches bounded by item count and token estimate."""
+    batches = []
+    current = []
+    current_tokens = 0
+
+    for idx, text in enumerate(texts):
+        tokens = estimate_tokens(text)
+        if current and (len(current) >= max_items or current_tokens + tokens > max_tokens):
+            batches.append(current)
+            current = []
+            current_tokens = 0
+        current.append(idx)
+        current_tokens += tokens
+
+    if current:
+        batches.append(current)
+
+    return batches
+
+
+def embed_batch(texts: list):
+    """One embeddings.create call for a list of texts, vectors in input order."""
+    resp = client.embeddings.create(
+        input=texts,
+        model=EMBED_MODEL
+    )
+    data = sorted(resp.data, key=lambda d: d.index)
+    if len(data) != len(texts):
+        raise ValueError(f"Expected {len(texts)} embeddings, got {len(data)}")
+    return [d.embedding for d in data]
+
+
+def embed_many(texts: list):
+    """
+    Embed many texts with batched requests.
+
+    Cached vectors are served from the embedding cache and only the misses
+    (deduplicated) are sent to OpenAI. Each batch is retried with
+    exponential backoff. Returns a list aligned with `texts`; entries of
+    batches that failed every retry are None.
+    """
+    results = [None] * len(texts)
+
+    keys = [embedding_key(t) for t in texts]
+    cached = embedding_cache.get_many(keys)
+
+    # Μοναδικά κείμενα που λείπουν από το cache → θέσεις στο results
+    missing = {}
+    for idx, key in enumerate(keys):
+        if key in cached:
+            results[idx] = unpack_vector(cached[key])
+        else:
+            missing.setdefault(key, []).append(idx)
+
+    pending_keys = list(missing)
+    pending_texts = [texts[missing[k][0]] for k in pending_keys]
+
+    for batch_num, batch in enumerate(make_embed_batches(pending_texts)):
+        batch_texts = [pending_texts[i] for i in batch]
+
+        for attempt in range(1, EMBED_MAX_RETRIES + 1):
+            try:
+                vectors = embed_batch(batch_texts)
+            except Exception as e:
+                print(f"⚠️ Embedding batch {batch_num} failed "
+                      f"(attempt {attempt}/{EMBED_MAX_RETRIES}): {e}")
+                if attempt < EMBED_MAX_RETRIES:
+                    time.sleep(EMBED_RETRY_BACKOFF * 2 ** (attempt - 1))
+                continue
+
+            fresh = {}
+            for i, vector in zip(batch, vectors):
+                key = pending_keys[i]
+                fresh[key] = pack_vector(vector)
+                for idx in missing[key]:
+                    results[idx] = vector
+            embedding_cache.set_many(fresh)
+            break
+
+    return results
 
 
 # ----------------------------------------
@@ -93,7 +270,12 @@ def chunk_text(text: str, chunk_size: int = 1000, overlap: int = 200):
 # ----------------------------------------
 # Add document into RAG DB
 # ----------------------------------------
-def rag_add_document(text: str, metadata: dict, collection: str):
+def rag_add_document(text: str, metadata: dict, collection: str, document_id: str = None):
+    """
+    Chunk, embed and store a document. With a `document_id` the chunk ids
+    are deterministic and written with upsert, so indexing the same
+    content again replaces its chunks instead of duplicating them.
+    """
     try:
         col = get_collection(collection)
         
@@ -103,35 +285,45 @@ def rag_add_document(text: str, metadata: dict, collection: str):
             print(f"⚠️ Text too long ({len(text)}), truncating to {MAX_TEXT_LENGTH}")
             text = text[:MAX_TEXT_LENGTH]
         
-        chunks = chunk_text(text, chunk_size=1000, overlap=200)
-        
+        chunks = chunk_text(text, chunk_size=1000, overlap=200)[:50]  # Μέγιστο 50 chunks
+
+        # Batched embeddings: ένα request ανά batch αντί για ένα ανά chunk
+        embeddings = embed_many(chunks)
+
         ids = []
         docs = []
         metas = []
         embeds = []
-        
-        # Προσθήκη chunks ένα-ένα για να αποφύγουμε memory issues
-        for idx, chunk in enumerate(chunks[:50]):  # Μέγιστο 50 chunks
-            cid = safe_filename(metadata.get("filename", "doc")) + f"_{idx}"
+        failed = 0
+
+        for idx, (chunk, vector) in enumerate(zip(chunks, embeddings)):
+            if vector is None:
+                failed += 1
+                continue
+            stem = document_id or safe_filename(metadata.get("filename", "doc"))
+            cid = f"{stem}_{idx}"
             ids.append(cid)
             docs.append(chunk)
             metas.append(metadata)
-            
-            try:
-                embeds.append(embed(chunk))
-            except Exception as e:
-                print(f"⚠️ Embedding error for chunk {idx}: {e}")
-                continue
-        
+            embeds.append(vector)
+
+        if failed:
+            print(f"⚠️ {failed}/{len(chunks)} chunks could not be embedded")
+
         if ids:  # Μόνο αν έχουμε embeddings
-            col.add(
+            write = col.upsert if document_id else col.add
+            write(
                 ids=ids,
                 documents=docs,
                 metadatas=metas,
                 embeddings=embeds
             )
+            bump_generation(collection)
             print(f"✅ Added {len(ids)} chunks to {collection}")
-            return {"status": "added", "chunks": len(ids)}
+            result = {"status": "added", "chunks": len(ids), "failed_chunks": failed}
+            if document_id:
+                result["document_id"] = document_id
+            return result
         else:
             print(f"❌ No chunks added to {collection}")
             return {"status": "error", "message": "No embeddings generated"}
@@ -140,22 +332,215 @@ def rag_add_document(text: str, metadata: dict, collection: str):
         print(f"❌ RAG add error: {e}")
         return {"status": "error", "message": str(e)}
 
+
+def _search_cache_key(query: str, collection: str, top_k: int, where: dict = None):
+    return (
+        collection,
+        collection_generation(collection),
+        normalize_text(query),
+        top_k,
+        json.dumps(where, sort_keys=True) if where else None,
+    )
+
+
 # ----------------------------------------
 # RAG SEARCH
 # ----------------------------------------
-def rag_search(query: str, collection: str, top_k: int = 3):
+def rag_search(query: str, collection: str, top_k: int = 3, where: dict = None):
+    cache_key = _search_cache_key(query, collection, top_k, where)
+    cached = search_result_cache.get(cache_key)
+    if cached is not None:
+        return dict(cached)
+
     col = get_collection(collection)
 
     # Δημιουργούμε εμείς το query embedding
-    q_embed = embed(query)
+    q_embed = embed_query(query)
 
-    res = col.query(
-        query_embeddings=[q_embed],
-        n_results=top_k
-    )
+    query_args = {"query_embeddings": [q_embed], "n_results": top_k}
+    if where:
+        query_args["where"] = where
+    res = col.query(**query_args)
 
-    return {
+    results = {
         "ids": res.get("ids", [[]])[0],
         "documents": res.get("documents", [[]])[0],
         "metadatas": res.get("metadatas", [[]])[0],
-    }
\ No newline at end of file
+    }
+    search_result_cache.set(cache_key, results)
+    return dict(results)
+
+
+def _query_row(res: dict, row: int, top_k: int) -> dict:
+    return {
+        "ids": (res.get("ids") or [[]])[row][:top_k],
+        "documents": (res.get("documents") or [[]])[row][:top_k],
+        "metadatas": (res.get("metadatas") or [[]])[row][:top_k],
+    }
+
+
+# ----------------------------------------
+# RAG BATCH SEARCH
+# ----------------------------------------
+def rag_search_batch(queries: list) -> list:
+    """
+    Run many searches with one embeddings call and one col.query per
+    (collection, filters) group.
+
+    `queries` is a list of dicts with keys query, collection, top_k and
+    optionally filters. Results come back in the same order.
+    """
+    results = [None] * len(queries)
+    pending = []
+
+    for idx, q in enumerate(queries):
+        key = _search_cache_key(q["query"], q["collection"], q.get("top_k", 3), q.get("filters"))
+        cached = search_result_cache.get(key)
+        if cached is not None:
+            results[idx] = dict(cached)
+        else:
+            pending.append((idx, key))
+
+    if not pending:
+        return results
+
+    # Query embeddings: πρώτα από το in-memory cache, τα υπόλοιπα σε ένα call
+    vectors = {}
+    to_embed = []
+    for idx, _ in pending:
+        vector = query_embedding_cache.get(normalize_text(queries[idx]["query"]))
+        if vector is None:
+            to_embed.append(idx)
+        else:
+            vectors[idx] = vector
+
+    if to_embed:
+        fresh = embed_many([queries[idx]["query"] for idx in to_embed])
+        for idx, vector in zip(to_embed, fresh):
+            if vector is None:
+                raise RuntimeError(f"Embedding failed for query {idx}")
+            vectors[idx] = vector
+            query_embedding_cache.set(normalize_text(queries[idx]["query"]), vector)
+
+    # Ομαδοποίηση ανά collection + filters → ένα col.query ανά ομάδα
+    groups = {}
+    for idx, key in pending:
+        q = queries[idx]
+        group_key = (q["collection"], key[4])
+        groups.setdefault(group_key, []).append((idx, key))
+
+    for (collection, _), members in groups.items():
+        col = get_collection(collection)
+        where = queries[members[0][0]].get("filters")
+        n_results = max(queries[idx].get("top_k", 3) for idx, _ in members)
+
+        query_args = {
+            "query_embeddings": [vectors[idx] for idx, _ in members],
+            "n_results": n_results,
+        }
+        if where:
+            query_args["where"] = where
+        res = col.query(**query_args)
+
+        for row, (idx, key) in enumerate(members):
+            result = _query_row(res, row, queries[idx].get("top_k", 3))
+            search_result_cache.set(key, result)
+            results[idx] = dict(result)
+
+    return results
+
+
+# ----------------------------------------
+# FEDERATED SEARCH (πολλές συλλογές μαζί)
+# ----------------------------------------
+def distance_to_score(distance: float, space: str = "l2") -> float:
+    """
+    Map a Chroma distance to a similarity score in [0, 1].
+
+    OpenAI embeddings are unit length, so every space reduces to cosine
+    similarity: l2 returns squared L2 = 2 - 2cos, cosine/ip return 1 - cos.
+    """
+    if space == "l2":
+        cos = 1.0 - distance / 2.0
+    else:
+        cos = 1.0 - distance
+    return max(0.0, min(1.0, (cos + 1.0) / 2.0))
+
+
+def _query_collection(collection: str, q_embed, top_k: int, where: dict = None):
+    start = time.perf_counter()
+    col = get_collection(collection)
+    space = (col.metadata or {}).get("hnsw:space", "l2")
+
+    query_args = {
+        "query_embeddings": [q_embed],
+        "n_results": top_k,
+        "include": ["documents", "metadatas", "distances"],
+    }
+    if where:
+        query_args["where"] = where
+    res = col.query(**query_args)
+
+    hits = []
+    for cid, doc, meta, dist in zip(
+        (res.get("ids") or [[]])[0],
+        (res.get("documents") or [[]])[0],
+        (res.get("metadatas") or [[]])[0],
+        (res.get("distances") or [[]])[0],
+    ):
+        hits.append({
+            "id": cid,
+            "document": doc,
+            "metadata": meta,
+            "collection": collection,
+            "distance": dist,
+            "score": round(distance_to_score(dist, space), 6),
+        })
+
+    elapsed_ms = (time.perf_counter() - start) * 1000
+    return hits, elapsed_ms
+
+
+def rag_search_federated(query: str, collections: list, top_k: int = 3, where: dict = None):
+    """
+    Embed the query once, query every collection concurrently and merge
+    the hits by normalized score (best first).
+    """
+    start = time.perf_counter()
+    q_embed = embed_query(query)
+    embed_ms = (time.perf_counter() - start) * 1000
+
+    hits = []
+    timings = {}
+    errors = {}
+
+    with ThreadPoolExecutor(max_workers=max(1, len(collections))) as pool:
+        futures = {
+            name: pool.submit(_query_collection, name, q_embed, top_k, where)
+            for name in collections
+        }
+        for name, future in futures.items():
+            try:
+                col_hits, elapsed_ms = future.result()
+            except Exception as e:
+                print(f"⚠️ Federated search failed for {name}: {e}")
+                errors[name] = str(e)
+                continue
+            hits.extend(col_hits)
+            timings[name] = round(elapsed_ms, 2)
+
+    hits.sort(key=lambda h: h["score"], reverse=True)
+    hits = hits[:top_k]
+
+    return {
+        "ids": [h["id"] for h in hits],
+        "documents": [h["document"] for h in hits],
+        "metadatas": [h["metadata"] for h in hits],
+        "results": hits,
+        "timings_ms": {
+            "embedding": round(embed_ms, 2),
+            "collections": timings,
+            "total": round((time.perf_counter() - start) * 1000, 2),
+        },
+        "errors": errors,
+    }
@@ -0,0 +1,7 @@
+# core/integrations/tokens.py
+"""Token estimates shared by embedding batching and prompt building (no heavy imports)."""
+
+
+def estimate_tokens(text: str) -> int:
+    """Rough token estimate (ελληνικά ~2 chars/token, άρα συντηρητικά)."""
+    return len(text) // 2 + 1
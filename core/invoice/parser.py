@@ -1,10 +1,15 @@
 import os
 import json
 import re
+import hashlib
+import unicodedata
 from pathlib import Path
 from openai import OpenAI
 from dotenv import load_dotenv
 
+from core.cache.disk_cache import DiskLRUCache
+from core.integrations.tokens import estimate_tokens
+
 # -------------------------------------
 # LOAD .env από το ROOT του project
 # -------------------------------------
@@ -41,94 +46,687 @@ Extract:
     - grand_total
 
 If a field is missing set it to null.
+
+Use exactly these JSON keys:
+{"customer_name": ..., "vat_number": ..., "invoice_number": ..., "invoice_date": ...,
+ "series": ..., "products": [{"description": ..., "quantity": ..., "unit_price": ...,
+ "line_total": ...}], "totals": {"subtotal": ..., "vat_amount": ..., "grand_total": ...}}
 """
 
+PARSE_MODEL = "gpt-4.1"
+# Αλλαγή στο prompt → νέο version → παλιά entries δεν ξαναχρησιμοποιούνται
+PROMPT_VERSION = hashlib.sha256(INVOICE_SYSTEM_PROMPT.encode("utf-8")).hexdigest()[:12]
+
 
 # ----------------------------------------------------------
-# REGEX FALLBACK — used if GPT fails
+# PARSE CACHE — ίδιο (κανονικοποιημένο) OCR text → ίδιο αποτέλεσμα
 # ----------------------------------------------------------
-def regex_fallback(text: str):
-    def clean(t):
-        return re.sub(r"[ \t]+", " ", t)
-
-    t = clean(text)
-
-    # Supplier
-    supplier = None
-    for line in t.split("\n")[:10]:
-        if line.strip().isupper() and len(line.strip()) > 3:
-            supplier = line.strip()
-            break
-
-    # Invoice number
-    invoice_num = None
-    patterns = [
-        r"ΤΙΜ(?:\.)?\s*№?\s*(\d+)",
-        r"ΤΙΜΟΛΟΓΙΟ\s*№?\s*(\d+)",
-        r"INV\s*(\d+)",
-        r"Invoice\s*(\d+)",
-    ]
-    for p in patterns:
-        m = re.search(p, t, re.IGNORECASE)
-        if m:
-            invoice_num = m.group(1)
-            break
+PARSE_CACHE_MAX_MB = int(os.getenv("PARSE_CACHE_MAX_MB", "64"))
+
+parse_cache = DiskLRUCache("invoice_parse.sqlite3", PARSE_CACHE_MAX_MB * 1024 * 1024)
+
+
+def normalize_ocr_text(text: str) -> str:
+    """NFC, no page separators, single spaces, no blank lines."""
+    text = unicodedata.normalize("NFC", text)
+    text = re.sub(r"^\s*--- Page \d+ ---\s*$", "", text, flags=re.MULTILINE)
+    lines = (re.sub(r"\s+", " ", line).strip() for line in text.splitlines())
+    return "\n".join(line for line in lines if line)
+
+
+def parse_cache_key(text: str, model: str = PARSE_MODEL) -> str:
+    digest = hashlib.sha256(normalize_ocr_text(text).encode("utf-8")).hexdigest()
+    return f"{model}:{PROMPT_VERSION}:{digest}"
+
+
+# ----------------------------------------------------------
+# FAST PARSER — regex tier, πριν (και αντί για) το LLM
+# ----------------------------------------------------------
+FAST_PARSE_MIN_CONFIDENCE = float(os.getenv("FAST_PARSE_MIN_CONFIDENCE", "0.8"))
+FAST_PARSE_REQUIRED = tuple(
+    f.strip() for f in
+    os.getenv("FAST_PARSE_REQUIRED", "invoice_number,invoice_date,grand_total,products").split(",")
+    if f.strip()
+)
+AMOUNT_TOLERANCE = 0.02
+CUSTOMER_BLOCK_LINES = 3    # γραμμές μετά από "Πελάτης"/"Bill to" που ανήκουν στον πελάτη
+
+HEADER_FIELDS = ("customer_name", "vat_number", "invoice_number", "invoice_date", "series")
+TOTAL_FIELDS = ("subtotal", "vat_amount", "grand_total")
+
+_AMOUNT = r"\d{1,3}(?:[.,\s]\d{3})*(?:[.,]\d{2})|\d+(?:[.,]\d{2})"
+AMOUNT_RE = re.compile(rf"(?<![\d.,])({_AMOUNT})(?![\d])")
+INVOICE_NUMBER_RE = re.compile(
+    r"(?:ΤΙΜΟΛΟΓΙΟ|ΤΙΜ\.?|INVOICE|INV)\s*(?:NO\.?|NUMBER|ΑΡ\.?|ΑΡΙΘΜΟΣ|№|#)?\s*[:.]?\s*([A-Z]{0,4}-?\d[A-Z0-9]*(?:[-/][A-Z0-9]+)*)"
+    r"|\b(?:ΑΡ\.?\s*ΠΑΡ\.?|ΑΡΙΘΜΟΣ|ΑΡ\.|Α/Α|NO\.|№)\s*[:.]?\s*(\d+)",
+    re.IGNORECASE,
+)
+DATE_RE = re.compile(r"\b(\d{1,2}[/.-]\d{1,2}[/.-](?:\d{4}|\d{2}))\b")
+DATE_LABEL_RE = re.compile(r"ΗΜΕΡΟΜΗΝΙΑ|ΗΜ/ΝΙΑ|ΗΜ\.|DATE", re.IGNORECASE)
+VAT_RE = re.compile(
+    r"(?:Α\.?Φ\.?Μ\.?|VAT\s*(?:NO\.?|NUMBER|ID)?)(?:\s+[A-ZΑ-Ω]+)?\s*[:.]?\s*(?:EL|GR)?\s*(\d{9})\b",
+    re.IGNORECASE,
+)
+CUSTOMER_LABEL_RE = re.compile(r"ΠΕΛΑΤ|ΑΓΟΡΑΣΤ|CUSTOMER|BUYER|BILL\s+TO", re.IGNORECASE)
+SERIES_RE = re.compile(r"(?:ΣΕΙΡΑ|SERIES)\s*[:.]?\s*([A-ZΑ-Ω0-9]{1,6})\b", re.IGNORECASE)
+CUSTOMER_RE = re.compile(
+    r"(?:ΠΕΛΑΤΗΣ|ΕΠΩΝΥΜΙΑ|CUSTOMER|BILL\s+TO)\s*[:.]\s*(.*)", re.IGNORECASE
+)
+TOTAL_LABEL_RES = {
+    "grand_total": re.compile(
+        r"ΠΛΗΡΩΤΕΟ|ΓΕΝΙΚΟ\s+ΣΥΝΟΛΟ|ΤΕΛΙΚΟ\s+ΣΥΝΟΛΟ|ΣΥΝΟΛΙΚΟ\s+ΠΟΣΟ|GRAND\s+TOTAL|TOTAL\s+DUE|AMOUNT\s+DUE",
+        re.IGNORECASE),
+    "subtotal": re.compile(
+        r"ΚΑΘΑΡΗ\s+ΑΞΙΑ|ΣΥΝΟΛΟ\s+ΚΑΘΑΡΗΣ|ΣΥΝ\.?\s*ΑΞΙΑ|ΜΕΡΙΚΟ\s+ΣΥΝΟΛΟ|SUBTOTAL|NET\s+AMOUNT",
+        re.IGNORECASE),
+    "vat_amount": re.compile(r"(?:ΠΟΣΟ\s+)?Φ\.?Π\.?Α\.?|VAT(?:\s+AMOUNT)?", re.IGNORECASE),
+}
+PAGE_SEPARATOR_RE = re.compile(r"^\s*--- Page \d+ ---\s*$")
+ITEM_CODE_RE = re.compile(r"^\d{3,}\s+(?=\S)")
+PLAIN_TOTAL_RE = re.compile(r"^\s*(?:ΣΥΝΟΛΟ|TOTAL)\b", re.IGNORECASE)
+PRODUCT_LINE_RE = re.compile(
+    rf"^(?P<description>.*?[A-Za-zΑ-Ωα-ωά-ώ].*?)\s+(?P<quantity>\d+(?:[.,]\d+)?)\s+(?:[A-Za-zΑ-Ωα-ω.]{{1,6}}\s+)?"
+    rf"(?P<unit_price>{_AMOUNT})\s+(?:(?:\d{{1,2}}(?:[.,]\d+)?\s*%)\s+)?(?P<line_total>{_AMOUNT})\s*(?:€|EUR)?\s*$",
+    re.IGNORECASE,
+)
+
+
+def fold_accents(text: str) -> str:
+    """Upper-case without Greek tonos/dialytika, for label matching."""
+    decomposed = unicodedata.normalize("NFD", text)
+    return "".join(c for c in decomposed if not unicodedata.combining(c)).upper()
+
+
+def parse_amount(value: str):
+    """'1.234,56' / '1,234.56' / '12,50' → float (None if unparsable)."""
+    if value is None:
+        return None
+    v = re.sub(r"\s", "", str(value))
+    if "," in v and "." in v:
+        decimal = "," if v.rfind(",") > v.rfind(".") else "."
+    elif "," in v:
+        decimal = "," if len(v) - v.rfind(",") - 1 != 3 else None
+    elif "." in v:
+        decimal = "." if len(v) - v.rfind(".") - 1 != 3 else None
+    else:
+        decimal = None
+    thousands = {",", "."} - {decimal}
+    for sep in thousands:
+        v = v.replace(sep, "")
+    if decimal:
+        v = v.replace(decimal, ".")
+    try:
+        return float(v)
+    except ValueError:
+        return None
+
+
+def _close(a: float, b: float) -> bool:
+    return abs(a - b) <= max(AMOUNT_TOLERANCE, abs(b) * 0.001)
+
+
+def _last_amount(line: str):
+    amounts = AMOUNT_RE.findall(line)
+    return parse_amount(amounts[-1]) if amounts else None
+
 
-    # Total amount (last price)
-    prices = re.findall(r"(\d{1,3}(?:\.\d{3})*,\d{2})", t)
-    total = prices[-1] if prices else None
+def fast_parse(text: str) -> dict:
+    """
+    Single pass over the OCR lines with precompiled patterns.
 
-    # Product lines
-    products = []
-    pattern = r"(.*?)[ ]+(\d+)[ ]+(\d+(?:,\d{2})?)[ ]+(\d+(?:,\d{2})?)"
+    Returns {"data", "confidence", "checks"}: data in the LLM schema,
+    confidence per field (0..1) and the arithmetic checks
+    (True / False / None when not applicable).
+    """
+    data = {f: None for f in HEADER_FIELDS}
+    data["products"] = []
+    data["totals"] = {f: None for f in TOTAL_FIELDS}
+    conf = {f: 0.0 for f in HEADER_FIELDS + TOTAL_FIELDS + ("products",)}
+    numbers = set()
+    vats = []
+    customer_lines = 0
+    all_amounts = []
+    item_consistency = []
 
-    for line in t.split("\n"):
-        m = re.search(pattern, line)
+    lines = [re.sub(r"[ \t]+", " ", line).strip() for line in text.splitlines()]
+    for i, line in enumerate(lines):
+        if not line:
+            continue
+        folded = fold_accents(line)
+        # Ίδιο μήκος → τα spans του folded ισχύουν και στο αρχικό κείμενο
+        source = line if len(folded) == len(line) else folded
+        labelled_customer = bool(CUSTOMER_LABEL_RE.search(folded))
+        customer_lines = CUSTOMER_BLOCK_LINES if labelled_customer else customer_lines - 1
+
+        m = VAT_RE.search(folded)
         if m:
-            products.append({
-                "description": m.group(1).strip(),
-                "quantity": m.group(2),
-                "unit_price": m.group(3),
-                "line_total": m.group(4),
+            # Μόνο ΑΦΜ πελάτη: με ετικέτα στη γραμμή ή μέσα στο μπλοκ στοιχείων πελάτη
+            if labelled_customer or customer_lines > 0:
+                vats.append((m.group(1), 0.9 if labelled_customer else 0.8))
+            continue
+
+        total_field = next((f for f, rx in TOTAL_LABEL_RES.items() if rx.search(folded)), None)
+        if total_field is None and PLAIN_TOTAL_RE.search(folded):
+            total_field = "grand_total"
+        if total_field:
+            amount = _last_amount(line)
+            # Η τελευταία ετικέτα κερδίζει (συνήθως "ΠΛΗΡΩΤΕΟ" μετά το "ΣΥΝΟΛΟ")
+            if amount is not None and (data["totals"][total_field] is None or total_field == "grand_total"):
+                data["totals"][total_field] = amount
+                conf[total_field] = 0.9 if total_field in TOTAL_LABEL_RES and \
+                    TOTAL_LABEL_RES[total_field].search(folded) else 0.7
+            all_amounts.extend(parse_amount(a) for a in AMOUNT_RE.findall(line))
+            continue
+
+        m = PRODUCT_LINE_RE.match(line)
+        if m and not DATE_RE.search(line):
+            qty = float(m.group("quantity").replace(",", "."))
+            price = parse_amount(m.group("unit_price"))
+            line_total = parse_amount(m.group("line_total"))
+            data["products"].append({
+                "description": ITEM_CODE_RE.sub("", m.group("description").strip(" .:-")),
+                "quantity": qty,
+                "unit_price": price,
+                "line_total": line_total,
             })
+            item_consistency.append(None not in (qty, price, line_total) and _close(qty * price, line_total))
+            all_amounts.extend(v for v in (price, line_total) if v is not None)
+            continue
+
+        m = INVOICE_NUMBER_RE.search(folded)
+        if m:
+            numbers.add(m.group(1) or m.group(2))
+        if data["invoice_date"] is None:
+            m = DATE_RE.search(line)
+            if m:
+                data["invoice_date"] = m.group(1)
+                conf["invoice_date"] = 0.9 if DATE_LABEL_RE.search(folded) else 0.6
+        if data["series"] is None:
+            m = SERIES_RE.search(folded)
+            if m:
+                data["series"] = source[m.start(1):m.end(1)]
+                conf["series"] = 0.9
+        if data["customer_name"] is None:
+            m = CUSTOMER_RE.search(folded)
+            if m:
+                value = source[m.start(1):m.end(1)].strip()
+                if not value and i + 1 < len(lines):
+                    value = lines[i + 1]
+                data["customer_name"] = value or None
+                conf["customer_name"] = 0.8 if value else 0.0
+        all_amounts.extend(parse_amount(a) for a in AMOUNT_RE.findall(line))
+
+    if numbers:
+        data["invoice_number"] = sorted(numbers, key=len, reverse=True)[0]
+        conf["invoice_number"] = 0.9 if len(numbers) == 1 else 0.5
+    if vats:
+        # Το prompt ζητάει το ΑΦΜ του πελάτη· το ΑΦΜ του εκδότη δεν μετράει
+        distinct = {v for v, _ in vats}
+        data["vat_number"] = vats[0][0]
+        conf["vat_number"] = vats[0][1] if len(distinct) == 1 else 0.5
+    if data["totals"]["grand_total"] is None:
+        amounts = [a for a in all_amounts if a is not None]
+        if amounts:
+            data["totals"]["grand_total"] = max(amounts)
+            conf["grand_total"] = 0.4
+    if data["products"]:
+        consistent = sum(item_consistency) / len(item_consistency)
+        conf["products"] = round(0.5 + 0.4 * consistent, 3)
+
+    checks = invoice_checks(data)
+
+    return {"data": data, "confidence": conf, "checks": checks}
+
+
+def invoice_checks(data: dict) -> dict:
+    """
+    Arithmetic checks on a parse result (any tier):
+    quantity × unit price = line total, Σ lines = subtotal (or grand
+    total), subtotal + VAT = grand total. None when not applicable.
+    """
+    totals = {f: parse_amount((data.get("totals") or {}).get(f)) for f in TOTAL_FIELDS}
+    products = [
+        {k: parse_amount(p.get(k)) for k in ("quantity", "unit_price", "line_total")}
+        for p in data.get("products") or [] if isinstance(p, dict)
+    ]
+    checks = {"line_items": None, "lines_sum": None, "totals_sum": None}
+    if products:
+        checks["line_items"] = all(
+            None not in p.values() and _close(p["quantity"] * p["unit_price"], p["line_total"])
+            for p in products
+        )
+    if products and all(p["line_total"] is not None for p in products):
+        lines_sum = sum(p["line_total"] for p in products)
+        target = totals["subtotal"] if totals["subtotal"] is not None else totals["grand_total"]
+        if target is not None:
+            checks["lines_sum"] = _close(lines_sum, target) or (
+                totals["subtotal"] is None and totals["vat_amount"] is not None
+                and _close(lines_sum + totals["vat_amount"], target))
+    if None not in (totals["subtotal"], totals["vat_amount"], totals["grand_total"]):
+        checks["totals_sum"] = _close(totals["subtotal"] + totals["vat_amount"], totals["grand_total"])
+    return checks
+
 
-    return {
-        "supplier": supplier,
-        "invoice_number": invoice_num,
-        "total_amount": total,
-        "products": products
-    }
+def fast_value(fast: dict, field: str):
+    """Value of a header/total field or "products" in a fast_parse() result."""
+    data = fast["data"]
+    return data["totals"][field] if field in TOTAL_FIELDS else data[field]
+
+
+def is_confident(fast: dict, field: str) -> bool:
+    """The regex tier filled `field` with enough confidence to use it."""
+    return fast_value(fast, field) not in (None, "", []) and \
+        fast["confidence"].get(field, 0.0) >= FAST_PARSE_MIN_CONFIDENCE
+
+
+def needs_llm(fast: dict) -> bool:
+    """True when a fast_parse() result cannot be returned without the LLM."""
+    conf = fast["confidence"]
+    if any(conf.get(f, 0.0) < FAST_PARSE_MIN_CONFIDENCE for f in FAST_PARSE_REQUIRED):
+        return True
+    # Κάθε τιμή που θα επιστρέφαμε πρέπει να είναι σίγουρη· αλλιώς LLM
+    if any(fast_value(fast, f) not in (None, "", []) and not is_confident(fast, f)
+           for f in HEADER_FIELDS + TOTAL_FIELDS + ("products",)):
+        return True
+    # Αποτυχημένος έλεγχος (False) → LLM· None = δεν εφαρμόζεται
+    return any(v is False for v in fast["checks"].values())
+
+
+def merge_tiers(llm: dict, fast: dict, llm_source: str) -> dict:
+    """LLM result, with null fields filled from confident regex fields ("missing" if neither)."""
+    merged = dict(llm)
+    merged.setdefault("totals", {})
+    merged["totals"] = dict(merged["totals"] or {})
+    field_sources = {}
+
+    def pick(container, key):
+        if container.get(key) not in (None, "", []):
+            field_sources[key] = llm_source
+        elif is_confident(fast, key):
+            container[key] = fast_value(fast, key)
+            field_sources[key] = "regex"
+        else:
+            field_sources[key] = "missing"
+
+    for f in HEADER_FIELDS + ("products",):
+        pick(merged, f)
+    for f in TOTAL_FIELDS:
+        pick(merged["totals"], f)
+    merged["field_sources"] = field_sources
+    return merged
 
 
 # ----------------------------------------------------------
-# MAIN PARSER — LLM → fallback_regex
+# SUPPLIER TEMPLATES — layout ανά προμηθευτή, εξαγωγή χωρίς LLM
 # ----------------------------------------------------------
-def parse_invoice_text(text: str) -> dict:
+TEMPLATE_CACHE_MAX_MB = int(os.getenv("TEMPLATE_CACHE_MAX_MB", "16"))
+TEMPLATE_MAX_FAILURES = 3
+TEMPLATE_HEADER_LINES = 3
+
+template_store = DiskLRUCache("supplier_templates.sqlite3", TEMPLATE_CACHE_MAX_MB * 1024 * 1024)
+
+TEMPLATE_VALUE_PATTERNS = {
+    "amount": _AMOUNT,
+    "date": r"\d{1,2}[/.-]\d{1,2}[/.-](?:\d{4}|\d{2})",
+    "code": r"[A-Za-zΑ-Ωα-ω0-9][A-Za-zΑ-Ωα-ω0-9/-]*",
+    "text": r".+",
+}
+TEMPLATE_FIELD_KINDS = {
+    "customer_name": "text",
+    "vat_number": "code",
+    "invoice_number": "code",
+    "invoice_date": "date",
+    "series": "code",
+    "subtotal": "amount",
+    "vat_amount": "amount",
+    "grand_total": "amount",
+}
+LABEL_WORD_RE = re.compile(r"[^\W\d_][^\s\d]*")
+
 
-    
+def _template_lines(text: str) -> list:
+    """(original, folded) per non-empty line, whitespace collapsed."""
+    lines = []
+    for raw in text.splitlines():
+        line = re.sub(r"\s+", " ", raw).strip()
+        if line and not PAGE_SEPARATOR_RE.match(raw):
+            lines.append((line, fold_accents(line)))
+    return lines
+
+
+def supplier_fingerprint(text: str):
+    """Issuer VAT number (first ΑΦΜ not labelled as the customer's), else header hash."""
+    lines = _template_lines(text)
+    for _, folded in lines:
+        m = VAT_RE.search(folded)
+        if m and not CUSTOMER_LABEL_RE.search(folded):
+            return f"vat:{m.group(1)}"
+    header = [re.sub(r"[\d\W_]+", " ", folded).strip() for _, folded in lines[:TEMPLATE_HEADER_LINES]]
+    header = " | ".join(h for h in header if h)
+    if len(header) < 8:
+        return None
+    return "hdr:" + hashlib.sha256(header.encode("utf-8")).hexdigest()[:16]
+
+
+def _field_value_string(field: str, data: dict):
+    value = data.get(field) if field in HEADER_FIELDS else (data.get("totals") or {}).get(field)
+    if value in (None, ""):
+        return None
+    return value if TEMPLATE_FIELD_KINDS[field] == "amount" else str(value).strip()
+
+
+def _locate(field: str, value, lines: list):
+    """(line index, start, end) of the value; amounts compared numerically."""
+    if TEMPLATE_FIELD_KINDS[field] == "amount":
+        target = parse_amount(value)
+        if target is None:
+            return None
+        # Τα σύνολα είναι στο τέλος → η τελευταία εμφάνιση
+        for i in range(len(lines) - 1, -1, -1):
+            for m in AMOUNT_RE.finditer(lines[i][0]):
+                if _close(parse_amount(m.group(1)), target):
+                    return i, m.start(1), m.end(1)
+        return None
+    # Ολόκληρη λέξη: η σειρά "Α" δεν είναι το "Α" του "ΑΕ"
+    rx = re.compile(rf"(?<!\w){re.escape(fold_accents(value))}(?!\w)")
+    for i, (_, folded) in enumerate(lines):
+        m = rx.search(folded)
+        if m:
+            return i, m.start(), m.end()
+    return None
+
+
+def _gap_pattern(gap: str) -> str:
+    """Text between label and value as a regex: numbers → \\d+, spaces → \\s*."""
+    parts = []
+    for token in re.findall(r"\d+|\s+|[^\d\s]+", gap):
+        if token.isdigit():
+            parts.append(r"\d+")
+        elif token.isspace():
+            parts.append(r"\s*")
+        else:
+            parts.append(re.escape(token))
+    return "".join(parts)
+
+
+def _nth_match(kind: str, lines: list, from_end: bool):
+    """All matches of a value pattern in reading order (reversed for totals)."""
+    rx = re.compile(TEMPLATE_VALUE_PATTERNS[kind])
+    found = [(i, m.start(), m.end()) for i, (_, folded) in enumerate(lines) for m in rx.finditer(folded)]
+    return found[::-1] if from_end else found
+
+
+def _anchor_rule(field: str, located, lines: list):
+    """
+    Label in front of the value (same line), a label-only previous line,
+    or — for unlabelled dates / amounts — the n-th value of that kind.
+    """
+    i, start, end = located
+    words = LABEL_WORD_RE.findall(lines[i][1][:start])
+    if words:
+        # Μία λέξη-ετικέτα αρκεί αν είναι ≥2 γράμματα ("ΑΡ."), αλλιώς δύο
+        anchor = words[-1] if len(words[-1].strip(".:")) >= 2 else " ".join(words[-2:])
+        prefix = lines[i][1][:start]
+        gap = prefix[prefix.rfind(anchor) + len(anchor):] if anchor in prefix else " "
+        return {"type": "inline", "anchor": anchor, "gap": _gap_pattern(gap)}
+    if start == 0 and i > 0 and not any(c.isdigit() for c in lines[i - 1][1]):
+        return {"type": "next_line", "anchor": lines[i - 1][1]}
+    kind = TEMPLATE_FIELD_KINDS[field]
+    if kind in ("date", "amount"):
+        matches = _nth_match(kind, lines, from_end=kind == "amount")
+        for n, (mi, ms, me) in enumerate(matches):
+            if mi == i and ms <= start and me >= end:
+                return {"type": "nth", "index": n}
+    return None
+
+
+def learn_template(text: str, data: dict):
+    """Record where each field of a validated parse sat; None if not learnable."""
+    fingerprint = supplier_fingerprint(text)
+    if fingerprint is None:
+        return None
+    lines = _template_lines(text)
+    rules = {}
+    for field in TEMPLATE_FIELD_KINDS:
+        value = _field_value_string(field, data)
+        if value is None:
+            continue
+        located = _locate(field, value, lines)
+        rule = _anchor_rule(field, located, lines) if located else None
+        if rule:
+            rules[field] = rule
+
+    required = [f for f in FAST_PARSE_REQUIRED if f in TEMPLATE_FIELD_KINDS]
+    if any(f not in rules for f in required):
+        return None
+    template = {"fingerprint": fingerprint, "fields": rules, "prompt_version": PROMPT_VERSION,
+                "failures": 0, "uses": 0}
+    template_store.set(fingerprint, json.dumps(template, ensure_ascii=False).encode("utf-8"))
+    return template
+
+
+def _apply_rule(rule: dict, kind: str, lines: list):
+    value_re = TEMPLATE_VALUE_PATTERNS[kind]
+    if rule["type"] == "inline":
+        rx = re.compile(re.escape(rule["anchor"]) + rule.get("gap", r"\s*") + f"({value_re})")
+        for line, folded in lines:
+            m = rx.search(folded)
+            if m:
+                source = line if len(line) == len(folded) else folded
+                return source[m.start(1):m.end(1)].strip()
+    elif rule["type"] == "next_line":
+        for i, (_, folded) in enumerate(lines[:-1]):
+            if folded == rule["anchor"]:
+                m = re.match(value_re, lines[i + 1][0])
+                return m.group(0).strip() if m else None
+    else:
+        matches = _nth_match(kind, lines, from_end=kind == "amount")
+        if rule["index"] < len(matches):
+            i, start, end = matches[rule["index"]]
+            return lines[i][1][start:end]
+    return None
+
+
+def extract_with_template(text: str, fast: dict):
+    """
+    Local extraction for a known supplier layout. Returns the parse data
+    if it validates (required fields present, no failed check), else None
+    and the template's failure count goes up; it is dropped after
+    TEMPLATE_MAX_FAILURES consecutive failures.
+    """
+    fingerprint = supplier_fingerprint(text)
+    raw = template_store.get(fingerprint) if fingerprint else None
+    if raw is None:
+        return None
+    template = json.loads(raw)
+
+    lines = _template_lines(text)
+    data = {f: None for f in HEADER_FIELDS}
+    data["totals"] = {f: None for f in TOTAL_FIELDS}
+    # Γραμμές ειδών: ο generic regex του fast tier (το template ελέγχει τα σύνολα)
+    data["products"] = fast["data"]["products"]
+    for field, rule in template["fields"].items():
+        kind = TEMPLATE_FIELD_KINDS[field]
+        value = _apply_rule(rule, kind, lines)
+        if kind == "amount":
+            value = parse_amount(value)
+        target = data["totals"] if field in TOTAL_FIELDS else data
+        target[field] = value
+
+    checks = invoice_checks(data)
+    valid = all(
+        (data["products"] if f == "products" else
+         data["totals"].get(f) if f in TOTAL_FIELDS else data.get(f)) not in (None, "", [])
+        for f in FAST_PARSE_REQUIRED
+    ) and not any(v is False for v in checks.values())
+
+    if valid:
+        template.update(failures=0, uses=template["uses"] + 1)
+    else:
+        template["failures"] += 1
+    if template["failures"] >= TEMPLATE_MAX_FAILURES:
+        template_store.delete_prefix(fingerprint)
+    else:
+        template_store.set(fingerprint, json.dumps(template, ensure_ascii=False).encode("utf-8"))
+    return {"data": data, "checks": checks, "fingerprint": fingerprint} if valid else None
+
+
+# ----------------------------------------------------------
+# PROMPT COMPACTION — μόνο header, γραμμές ειδών και σύνολα στο LLM
+# ----------------------------------------------------------
+PROMPT_COMPACTION = os.getenv("PROMPT_COMPACTION", "1") == "1"
+PROMPT_HEADER_LINES = 15
+PROMPT_PROSE_CHARS = 80     # μακριές γραμμές χωρίς αριθμούς = νομικά κείμενα/όροι
+MAX_TEXT_LENGTH = 10000  # περίπου 3k tokens
+
+BOILERPLATE_RE = re.compile(
+    r"ΕΥΧΑΡΙΣΤΟΥΜΕ|ΣΕΛΙΔΑ\s*\d+|PAGE\s*\d+\s*(?:OF|/)|THANK\s+YOU|WWW\.|HTTPS?://|E-?MAIL|@"
+    r"|ΟΡΟΙ\s+(?:ΠΩΛΗΣΗΣ|ΧΡΗΣΗΣ)|TERMS\s+(?:AND|&)\s+CONDITIONS|ΕΚΤΥΠΩΘΗΚΕ|PRINTED\s+BY"
+    r"|ΠΑΡΟΧΟΣ|PROVIDER|ΑΔΕΙΑ\s+ΑΑΔΕ|ΑΡ\.?\s*ΓΕΜΗ|SOFTWARE",
+    re.IGNORECASE,
+)
+FIELD_LABEL_RES = (
+    INVOICE_NUMBER_RE, DATE_LABEL_RE, VAT_RE, SERIES_RE, CUSTOMER_RE, CUSTOMER_LABEL_RE,
+    PLAIN_TOTAL_RE, *TOTAL_LABEL_RES.values(),
+)
+
+
+def compact_invoice_text(text: str) -> str:
+    """
+    Drop what the parser never needs: page separators, blank and
+    duplicated whitespace, boilerplate (footers, URLs, page counters,
+    e-invoicing provider notices, long legal prose) and lines repeated
+    on every page.
+    Kept: the header block, every line with a digit (item table,
+    totals, numbers, dates) and every line with a field label, even one
+    that also matches a boilerplate pattern.
+    """
+    kept = []
+    seen = set()
+    header_left = PROMPT_HEADER_LINES
+    keep_next = False
+
+    for raw in text.splitlines():
+        if PAGE_SEPARATOR_RE.match(raw):
+            continue
+        line = re.sub(r"\s+", " ", raw).strip()
+        if not line or not any(c.isalnum() for c in line):
+            continue
+        folded = fold_accents(line)
+        labelled = any(rx.search(folded) for rx in FIELD_LABEL_RES)
+        # Header γραμμές "Τηλ/Email/ΓΕΜΗ ... ΑΦΜ: ..." κρατιούνται λόγω ετικέτας
+        if BOILERPLATE_RE.search(folded) and not labelled:
+            continue
+
+        has_digit = any(c.isdigit() for c in line)
+        # Επαναλαμβανόμενα headers σελίδων· ίδιες γραμμές ειδών με ποσά μένουν
+        if folded in seen and not AMOUNT_RE.search(line):
+            continue
+        seen.add(folded)
+
+        if len(line) > PROMPT_PROSE_CHARS and not has_digit and not labelled:
+            continue
+        if header_left > 0 or has_digit or labelled or keep_next:
+            kept.append(line)
+        header_left -= 1
+        # Ετικέτα χωρίς τιμή ("Πελάτης:") → η τιμή είναι στην επόμενη γραμμή
+        keep_next = labelled and not has_digit and line.endswith(":")
+
+    return "\n".join(kept)
+
+
+# ----------------------------------------------------------
+# MAIN PARSER — fast regex tier → (cache) → LLM
+# ----------------------------------------------------------
+def prepare_prompt_text(text: str, compact: bool = None) -> tuple:
+    """(text for the LLM, {"before", "after"} token estimates)."""
+    compact = PROMPT_COMPACTION if compact is None else compact
+    before = estimate_tokens(text)
+    if compact:
+        text = compact_invoice_text(text)
     # Safety limit to avoid token overflow
-    MAX_TEXT_LENGTH = 10000  # περίπου 3k tokens
     if len(text) > MAX_TEXT_LENGTH:
         text = text[:MAX_TEXT_LENGTH]
+    tokens = {"before": before, "after": estimate_tokens(text)}
+    print(f"[DEBUG] Parse prompt tokens: {tokens['before']} → {tokens['after']}")
+    return text, tokens
+
+
+def llm_parse(text: str, model: str = PARSE_MODEL) -> dict:
+    """One uncached LLM parse of (already prepared) OCR text."""
     client = get_client()
     user_prompt = f"Extract the invoice data from the following OCR text:\n\n{text}"
+    response = client.chat.completions.create(
+        model=model,
+        messages=[
+            {"role": "system", "content": INVOICE_SYSTEM_PROMPT},
+            {"role": "user", "content": user_prompt}
+        ],
+        temperature=0
+    )
+    return json.loads(response.choices[0].message.content)
 
-    try:
-        response = client.chat.completions.create(
-            model="gpt-4.1",
-            messages=[
-                {"role": "system", "content": INVOICE_SYSTEM_PROMPT},
-                {"role": "user", "content": user_prompt}
-            ],
-            temperature=0
-        )
 
-        content = response.choices[0].message.content
-        return json.loads(content)
+def _learn_from(text: str, merged: dict) -> dict:
+    """Store a supplier template when the LLM result passes every check."""
+    checks = invoice_checks(merged)
+    if checks["lines_sum"] and not any(v is False for v in checks.values()):
+        template = learn_template(text, merged)
+        if template:
+            print(f"[DEBUG] Learned supplier template {template['fingerprint']} "
+                  f"({len(template['fields'])} fields)")
+    return merged
+
+
+def parse_invoice_text(text: str) -> dict:
+    """
+    Tiered invoice parsing. The regex tier answers alone when every
+    required field, and every other value it found, is confident and the
+    totals add up; otherwise the LLM is asked (through the parse cache)
+    and any fields it leaves null are filled from confident regex
+    matches. `field_sources` says which tier produced each field
+    ("missing" when none did). The LLM sees compact_invoice_text() output.
+
+    Between the two, a learned supplier template (see learn_template)
+    extracts repeat suppliers locally; a template that fails validation
+    falls through to the LLM, whose validated result re-learns it.
+    """
+    fast = fast_parse(text)
+    tier_info = {"confidence": fast["confidence"], "checks": fast["checks"]}
+    if not needs_llm(fast):
+        sources = {f: "regex" if is_confident(fast, f) else "missing"
+                   for f in HEADER_FIELDS + ("products",) + TOTAL_FIELDS}
+        return {**fast["data"], "source": "regex", "field_sources": sources, **tier_info}
+
+    templated = extract_with_template(text, fast)
+    if templated is not None:
+        data = templated["data"]
+        sources = {f: "template" if (data["totals"].get(f) if f in TOTAL_FIELDS else data.get(f))
+                   not in (None, "", []) else "missing"
+                   for f in HEADER_FIELDS + ("products",) + TOTAL_FIELDS}
+        return {**templated["data"], "source": "template", "field_sources": sources,
+                "template": templated["fingerprint"], **tier_info, "checks": templated["checks"]}
+
+    prompt_text, tokens = prepare_prompt_text(text)
+    tier_info["prompt_tokens"] = tokens
+
+    cache_key = parse_cache_key(prompt_text)
+    cached = parse_cache.get(cache_key)
+    if cached is not None:
+        merged = merge_tiers(json.loads(cached), fast, "llm_cache")
+        return {**_learn_from(text, merged), "source": "llm_cache", **tier_info}
+
+    try:
+        parsed = llm_parse(prompt_text)
+        # Μόνο επιτυχημένα parses μπαίνουν στο cache
+        parse_cache.set(cache_key, json.dumps(parsed, ensure_ascii=False).encode("utf-8"))
+        merged = merge_tiers(parsed, fast, "llm")
+        return {**_learn_from(text, merged), "source": "llm", **tier_info}
 
     except Exception as e:
         return {
             "source": "fallback_regex",
             "error": str(e),
-            "data": regex_fallback(text)
+            "data": fast["data"],
+            **tier_info
         }
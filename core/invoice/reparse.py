@@ -0,0 +1,294 @@
+# core/invoice/reparse.py
+"""
+Bulk offline re-parse of stored invoices (e.g. after an
+INVOICE_SYSTEM_PROMPT change).
+
+Invoices come from the upload catalog (every distinct invoice ever
+uploaded, including older ones whose filename was reused), or from a
+directory with --dir. Text comes from the OCR cache (OCR runs only for
+files never seen before). Invoices the regex tier handles, or whose parse for the current
+prompt version is already cached, cost nothing; the rest are packed
+several per chat request and sent with bounded concurrency. Results go
+into the parse cache, so later uploads of the same invoices are cache
+hits, and into a checkpoint database keyed by (content hash, prompt
+version): an interrupted run started again skips what already finished.
+
+CLI:
+    python -m core.invoice.reparse run [--dir DIR] [--pack 5] [--workers 4]
+    python -m core.invoice.reparse status
+"""
+import os
+import sys
+import json
+import time
+import sqlite3
+import argparse
+import threading
+from pathlib import Path
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+from core.invoice.parser import (
+    INVOICE_SYSTEM_PROMPT,
+    PARSE_MODEL,
+    PROMPT_VERSION,
+    fast_parse,
+    get_client,
+    llm_parse,
+    merge_tiers,
+    needs_llm,
+    parse_cache,
+    parse_cache_key,
+    prepare_prompt_text,
+)
+from core.ocr import ocr_cache
+from core.ocr.invoice_ocr import ocr_document
+from core.storage.blob_store import blob_catalog, blob_store
+
+# ----------------------------------------
+# Settings
+# ----------------------------------------
+REPARSE_DB_PATH = Path(os.getenv("REPARSE_DB_PATH", "./jobs/reparse.sqlite3"))
+REPARSE_PACK_SIZE = int(os.getenv("REPARSE_PACK_SIZE", "5"))
+REPARSE_PACK_MAX_TOKENS = int(os.getenv("REPARSE_PACK_MAX_TOKENS", "12000"))
+REPARSE_WORKERS = int(os.getenv("REPARSE_WORKERS", "4"))
+
+INVOICE_EXTENSIONS = (".pdf", ".jpg", ".jpeg", ".png")
+
+PACKED_INSTRUCTIONS = """
+You will receive several invoices, each starting with a line
+### INVOICE <id> ###
+Extract every invoice independently with the rules above and return ONE JSON
+object mapping each <id> to that invoice's JSON object.
+"""
+
+
+# ----------------------------------------
+# Checkpoint (SQLite)
+# ----------------------------------------
+class ReparseCheckpoint:
+    """Per-invoice status for one prompt version; survives crashes."""
+
+    def __init__(self, path: Path = REPARSE_DB_PATH):
+        path.parent.mkdir(parents=True, exist_ok=True)
+        self.path = path
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(str(path), check_same_thread=False, isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS items ("
+            " content_hash TEXT NOT NULL,"
+            " prompt_version TEXT NOT NULL,"
+            " path TEXT NOT NULL,"
+            " status TEXT NOT NULL,"          # done | failed
+            " tier TEXT,"
+            " result TEXT,"
+            " error TEXT,"
+            " updated_at REAL NOT NULL,"
+            " PRIMARY KEY (content_hash, prompt_version))"
+        )
+
+    def done_hashes(self, prompt_version: str = PROMPT_VERSION) -> set:
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT content_hash FROM items WHERE prompt_version = ? AND status = 'done'",
+                (prompt_version,)
+            ).fetchall()
+        return {r[0] for r in rows}
+
+    def record(self, content_hash: str, path: str, status: str, tier: str = None,
+               result: dict = None, error: str = None):
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO items (content_hash, prompt_version, path, status, tier,"
+                " result, error, updated_at) VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                (content_hash, PROMPT_VERSION, path, status, tier,
+                 json.dumps(result, ensure_ascii=False) if result is not None else None,
+                 error, time.time())
+            )
+
+    def stats(self, prompt_version: str = PROMPT_VERSION) -> dict:
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT status, COALESCE(tier, ''), COUNT(*) FROM items"
+                " WHERE prompt_version = ? GROUP BY status, tier",
+                (prompt_version,)
+            ).fetchall()
+        stats = {"prompt_version": prompt_version, "done": 0, "failed": 0, "tiers": {}}
+        for status, tier, count in rows:
+            stats[status] = stats.get(status, 0) + count
+            if status == "done":
+                stats["tiers"][tier] = count
+        return stats
+
+
+# ----------------------------------------
+# Packed LLM requests
+# ----------------------------------------
+def make_packs(items: list, max_items: int = REPARSE_PACK_SIZE,
+               max_tokens: int = REPARSE_PACK_MAX_TOKENS) -> list:
+    """Group prepared items by count and prompt-token estimate."""
+    packs = []
+    current = []
+    current_tokens = 0
+    for item in items:
+        tokens = item["tokens"]["after"]
+        if current and (len(current) >= max_items or current_tokens + tokens > max_tokens):
+            packs.append(current)
+            current, current_tokens = [], 0
+        current.append(item)
+        current_tokens += tokens
+    if current:
+        packs.append(current)
+    return packs
+
+
+def llm_parse_packed(items: list) -> dict:
+    """One chat request for several invoices → {item id: parsed dict}."""
+    if len(items) == 1:
+        return {items[0]["id"]: llm_parse(items[0]["prompt_text"])}
+
+    body = "\n\n".join(f"### INVOICE {item['id']} ###\n{item['prompt_text']}" for item in items)
+    response = get_client().chat.completions.create(
+        model=PARSE_MODEL,
+        messages=[
+            {"role": "system", "content": INVOICE_SYSTEM_PROMPT + PACKED_INSTRUCTIONS},
+            {"role": "user", "content": f"Extract the invoice data from the following OCR texts:\n\n{body}"}
+        ],
+        temperature=0
+    )
+    parsed = json.loads(response.choices[0].message.content)
+    return {item["id"]: parsed[item["id"]] for item in items
+            if isinstance(parsed.get(item["id"]), dict)}
+
+
+def _run_pack(pack: list, checkpoint: ReparseCheckpoint) -> dict:
+    counts = {"llm": 0, "failed": 0}
+    try:
+        results = llm_parse_packed(pack)
+    except Exception as e:
+        print(f"⚠️ Packed request failed ({len(pack)} invoices): {e}")
+        results = {}
+
+    for item in pack:
+        parsed = results.get(item["id"])
+        if parsed is None:
+            # Λείπει από την packed απάντηση → μεμονωμένο request
+            try:
+                parsed = llm_parse(item["prompt_text"])
+            except Exception as e:
+                checkpoint.record(item["content_hash"], item["path"], "failed", error=str(e)[:500])
+                counts["failed"] += 1
+                continue
+        parse_cache.set(parse_cache_key(item["prompt_text"]),
+                        json.dumps(parsed, ensure_ascii=False).encode("utf-8"))
+        checkpoint.record(item["content_hash"], item["path"], "done", "llm",
+                          merge_tiers(parsed, item["fast"], "llm"))
+        counts["llm"] += 1
+    return counts
+
+
+# ----------------------------------------
+# Run
+# ----------------------------------------
+def _prepare(path: Path, filename: str, content_hash: str, checkpoint: ReparseCheckpoint):
+    """OCR text → regex tier / parse cache; returns an LLM work item or None."""
+    text = ocr_document(str(path), filename, content_hash=content_hash)["text"]
+    if len(text.strip()) < 20:
+        checkpoint.record(content_hash, str(path), "failed", error="OCR: too little text")
+        return "failed"
+
+    fast = fast_parse(text)
+    if not needs_llm(fast):
+        checkpoint.record(content_hash, str(path), "done", "regex", fast["data"])
+        return "regex"
+
+    prompt_text, tokens = prepare_prompt_text(text)
+    cached = parse_cache.get(parse_cache_key(prompt_text))
+    if cached is not None:
+        checkpoint.record(content_hash, str(path), "done", "llm_cache",
+                          merge_tiers(json.loads(cached), fast, "llm_cache"))
+        return "llm_cache"
+
+    return {"id": content_hash[:12], "content_hash": content_hash, "path": str(path),
+            "prompt_text": prompt_text, "tokens": tokens, "fast": fast}
+
+
+def stored_invoices():
+    """(blob path, latest filename, content hash) of every uploaded invoice."""
+    for content_hash, filename in blob_catalog.hashes("invoices"):
+        path = blob_store.path_for(content_hash)
+        if Path(filename).suffix.lower() in INVOICE_EXTENSIONS and path.exists():
+            yield path, filename, content_hash
+
+
+def directory_invoices(directory: Path):
+    for path in sorted(p for p in directory.rglob("*") if p.suffix.lower() in INVOICE_EXTENSIONS):
+        yield path, path.name, ocr_cache.file_sha256(str(path))
+
+
+def run_reparse(directory: Path = None, pack_size: int = REPARSE_PACK_SIZE,
+                workers: int = REPARSE_WORKERS, checkpoint: ReparseCheckpoint = None,
+                limit: int = None) -> dict:
+    """Re-parse the catalog's invoices (or the files under `directory`)."""
+    checkpoint = checkpoint or ReparseCheckpoint()
+    done = checkpoint.done_hashes()
+    counts = {"files": 0, "skipped": 0, "regex": 0, "llm_cache": 0, "llm": 0, "failed": 0}
+
+    invoices = directory_invoices(directory) if directory else stored_invoices()
+    pending = []
+    seen = set()
+    for path, filename, content_hash in invoices:
+        if limit is not None and counts["files"] >= limit:
+            break
+        counts["files"] += 1
+        if content_hash in done or content_hash in seen:
+            counts["skipped"] += 1
+            continue
+        seen.add(content_hash)
+        try:
+            outcome = _prepare(path, filename, content_hash, checkpoint)
+        except Exception as e:
+            checkpoint.record(content_hash, str(path), "failed", error=str(e)[:500])
+            outcome = "failed"
+        if isinstance(outcome, dict):
+            pending.append(outcome)
+        else:
+            counts[outcome] += 1
+
+    packs = make_packs(pending, max_items=pack_size)
+    print(f"📦 {len(pending)} invoice(s) need the LLM → {len(packs)} request(s), {workers} worker(s)")
+    with ThreadPoolExecutor(max_workers=max(1, workers), thread_name_prefix="reparse") as pool:
+        futures = [pool.submit(_run_pack, pack, checkpoint) for pack in packs]
+        for i, future in enumerate(as_completed(futures), 1):
+            for key, value in future.result().items():
+                counts[key] += value
+            print(f"   {i}/{len(packs)} requests done")
+
+    return counts
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="AInteG bulk invoice re-parse")
+    sub = parser.add_subparsers(dest="command", required=True)
+    run_cmd = sub.add_parser("run", help="re-parse stored invoices with the current prompt")
+    run_cmd.add_argument("--dir", type=Path, default=None,
+                         help="walk a directory instead of the upload catalog")
+    run_cmd.add_argument("--pack", type=int, default=REPARSE_PACK_SIZE,
+                         help="invoices per chat request")
+    run_cmd.add_argument("--workers", type=int, default=REPARSE_WORKERS)
+    run_cmd.add_argument("--limit", type=int, default=None)
+    sub.add_parser("status", help="progress for the current prompt version")
+    args = parser.parse_args(argv)
+
+    checkpoint = ReparseCheckpoint()
+    if args.command == "run":
+        print(f"🔁 Re-parsing {args.dir or 'stored invoices'} (prompt version {PROMPT_VERSION})")
+        counts = run_reparse(args.dir, args.pack, args.workers, checkpoint, args.limit)
+        print(json.dumps(counts, indent=2))
+    elif args.command == "status":
+        print(json.dumps(checkpoint.stats(), indent=2))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,343 @@
+import os
+import json
+import time
+import uuid
+import socket
+import sqlite3
+import threading
+import traceback
+from contextlib import contextmanager
+from pathlib import Path
+
+# ----------------------------------------
+# Settings
+# ----------------------------------------
+JOBS_DB_PATH = Path(os.getenv("JOBS_DB_PATH", "./jobs/jobs.sqlite3"))
+JOB_WORKERS = int(os.getenv("JOB_WORKERS", "2"))
+JOB_MAX_ATTEMPTS = int(os.getenv("JOB_MAX_ATTEMPTS", "3"))
+JOB_RETRY_BASE = float(os.getenv("JOB_RETRY_BASE", "5"))      # seconds, doubles per attempt
+JOB_LEASE_SECONDS = float(os.getenv("JOB_LEASE_SECONDS", "600"))
+JOB_HEARTBEAT_SECONDS = float(os.getenv("JOB_HEARTBEAT_SECONDS", str(JOB_LEASE_SECONDS / 3)))
+JOB_POLL_INTERVAL = float(os.getenv("JOB_POLL_INTERVAL", "0.5"))
+
+WORKER_ID = f"{socket.gethostname()}:{os.getpid()}"
+
+
+def _pid_alive(pid: int) -> bool:
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    return True
+
+
+# ----------------------------------------
+# Persistent job queue (SQLite)
+# ----------------------------------------
+class JobQueue:
+    """
+    Durable job queue stored in SQLite.
+
+    A claimed job holds a lease, extended by a heartbeat while it runs; if
+    the worker dies the lease expires (or the orphan is recovered on
+    startup) and the job runs again. Failed attempts — crashes included —
+    are retried with exponential backoff up to JOB_MAX_ATTEMPTS.
+    """
+
+    def __init__(self, path: Path = JOBS_DB_PATH):
+        path.parent.mkdir(parents=True, exist_ok=True)
+        self.path = path
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(
+            str(path), check_same_thread=False, timeout=30, isolation_level=None
+        )
+        self._conn.row_factory = sqlite3.Row
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS jobs ("
+            " id TEXT PRIMARY KEY,"
+            " kind TEXT NOT NULL,"
+            " payload TEXT NOT NULL,"
+            " status TEXT NOT NULL,"          # queued | running | done | failed
+            " progress TEXT NOT NULL DEFAULT '{}',"
+            " result TEXT,"
+            " error TEXT,"
+            " attempts INTEGER NOT NULL DEFAULT 0,"
+            " max_attempts INTEGER NOT NULL,"
+            " next_run_at REAL NOT NULL,"
+            " lease_until REAL,"
+            " worker_id TEXT,"
+            " created_at REAL NOT NULL,"
+            " updated_at REAL NOT NULL)"
+        )
+        self._conn.execute(
+            "CREATE INDEX IF NOT EXISTS idx_jobs_status ON jobs(status, next_run_at)"
+        )
+
+    # -------------------- producer side --------------------
+    def enqueue(self, kind: str, payload: dict, max_attempts: int = JOB_MAX_ATTEMPTS) -> str:
+        job_id = uuid.uuid4().hex
+        now = time.time()
+        with self._lock:
+            self._conn.execute(
+                "INSERT INTO jobs (id, kind, payload, status, max_attempts, next_run_at,"
+                " created_at, updated_at) VALUES (?, ?, ?, 'queued', ?, ?, ?, ?)",
+                (job_id, kind, json.dumps(payload), max_attempts, now, now, now)
+            )
+        return job_id
+
+    def get(self, job_id: str):
+        with self._lock:
+            row = self._conn.execute("SELECT * FROM jobs WHERE id = ?", (job_id,)).fetchone()
+        return self._to_dict(row) if row else None
+
+    def list(self, limit: int = 50, status: str = None) -> list:
+        query = "SELECT * FROM jobs"
+        args = []
+        if status:
+            query += " WHERE status = ?"
+            args.append(status)
+        query += " ORDER BY created_at DESC LIMIT ?"
+        args.append(limit)
+        with self._lock:
+            rows = self._conn.execute(query, args).fetchall()
+        return [self._to_dict(r) for r in rows]
+
+    # -------------------- worker side --------------------
+    def claim(self):
+        """Atomically take the next runnable job (or an expired lease)."""
+        now = time.time()
+        with self._lock:
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                # Ληγμένο lease στην τελευταία προσπάθεια → failed, όχι άπειρα retries
+                self._conn.execute(
+                    "UPDATE jobs SET status = 'failed',"
+                    " error = 'Lease expired on attempt ' || attempts || '/' || max_attempts,"
+                    " lease_until = NULL, updated_at = ?"
+                    " WHERE status = 'running' AND lease_until < ? AND attempts >= max_attempts",
+                    (now, now)
+                )
+                row = self._conn.execute(
+                    "SELECT * FROM jobs WHERE"
+                    " (status = 'queued' AND next_run_at <= ?)"
+                    " OR (status = 'running' AND lease_until < ?)"
+                    " ORDER BY next_run_at ASC LIMIT 1",
+                    (now, now)
+                ).fetchone()
+                if row is None:
+                    self._conn.execute("COMMIT")
+                    return None
+                self._conn.execute(
+                    "UPDATE jobs SET status = 'running', attempts = attempts + 1,"
+                    " lease_until = ?, worker_id = ?, updated_at = ? WHERE id = ?",
+                    (now + JOB_LEASE_SECONDS, WORKER_ID, now, row["id"])
+                )
+                self._conn.execute("COMMIT")
+            except Exception:
+                self._conn.execute("ROLLBACK")
+                raise
+        job = self._to_dict(row)
+        job["attempts"] += 1
+        job["status"] = "running"
+        return job
+
+    def heartbeat(self, job_id: str):
+        """Extend the lease of a job that is still running."""
+        now = time.time()
+        with self._lock:
+            self._conn.execute(
+                "UPDATE jobs SET lease_until = ? WHERE id = ? AND status = 'running'",
+                (now + JOB_LEASE_SECONDS, job_id)
+            )
+
+    def update_progress(self, job_id: str, progress: dict):
+        """Store stage progress and extend the lease (acts as heartbeat)."""
+        now = time.time()
+        with self._lock:
+            self._conn.execute(
+                "UPDATE jobs SET progress = ?, lease_until = ?, updated_at = ? WHERE id = ?",
+                (json.dumps(progress), now + JOB_LEASE_SECONDS, now, job_id)
+            )
+
+    def complete(self, job_id: str, result: dict):
+        now = time.time()
+        with self._lock:
+            self._conn.execute(
+                "UPDATE jobs SET status = 'done', result = ?, error = NULL,"
+                " lease_until = NULL, updated_at = ? WHERE id = ?",
+                (json.dumps(result, default=str), now, job_id)
+            )
+
+    def fail(self, job_id: str, error: str, attempts: int, max_attempts: int):
+        """Schedule a retry with exponential backoff, or mark the job failed."""
+        now = time.time()
+        with self._lock:
+            if attempts < max_attempts:
+                delay = JOB_RETRY_BASE * 2 ** (attempts - 1)
+                self._conn.execute(
+                    "UPDATE jobs SET status = 'queued', error = ?, next_run_at = ?,"
+                    " lease_until = NULL, updated_at = ? WHERE id = ?",
+                    (error, now + delay, now, job_id)
+                )
+            else:
+                self._conn.execute(
+                    "UPDATE jobs SET status = 'failed', error = ?,"
+                    " lease_until = NULL, updated_at = ? WHERE id = ?",
+                    (error, now, job_id)
+                )
+
+    def recover_orphans(self) -> int:
+        """
+        Requeue running jobs of dead processes on this host (after a
+        restart); a job that died on its last attempt is marked failed.
+        """
+        host = socket.gethostname()
+        requeued = 0
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT id, worker_id, attempts, max_attempts FROM jobs WHERE status = 'running'"
+            ).fetchall()
+            for row in rows:
+                owner_host, _, pid = (row["worker_id"] or "").rpartition(":")
+                if owner_host != host or not pid.isdigit():
+                    continue
+                if int(pid) != os.getpid() and _pid_alive(int(pid)):
+                    continue
+                if row["attempts"] >= row["max_attempts"]:
+                    self._conn.execute(
+                        "UPDATE jobs SET status = 'failed', error = ?, lease_until = NULL,"
+                        " updated_at = ? WHERE id = ?",
+                        (f"Worker died on attempt {row['attempts']}/{row['max_attempts']}",
+                         time.time(), row["id"])
+                    )
+                    continue
+                self._conn.execute(
+                    "UPDATE jobs SET status = 'queued', next_run_at = ?, lease_until = NULL,"
+                    " updated_at = ? WHERE id = ?",
+                    (time.time(), time.time(), row["id"])
+                )
+                requeued += 1
+        return requeued
+
+    @staticmethod
+    def _to_dict(row) -> dict:
+        job = dict(row)
+        job["payload"] = json.loads(job["payload"])
+        job["progress"] = json.loads(job["progress"] or "{}")
+        job["result"] = json.loads(job["result"]) if job["result"] else None
+        return job
+
+
+job_queue = JobQueue()
+
+
+# ----------------------------------------
+# Per-job progress reporting
+# ----------------------------------------
+class JobContext:
+    """Handed to job handlers; records per-stage status and timings."""
+
+    def __init__(self, queue: JobQueue, job: dict):
+        self.queue = queue
+        self.job_id = job["id"]
+        self.attempt = job["attempts"]
+        self.progress = job.get("progress") or {}
+        self._lock = threading.Lock()
+
+    def is_done(self, stage: str) -> bool:
+        return self.progress.get(stage, {}).get("status") == "done"
+
+    def report(self, stage: str, **info):
+        with self._lock:
+            self.progress.setdefault(stage, {}).update(info)
+            snapshot = json.loads(json.dumps(self.progress, default=str))
+        self.queue.update_progress(self.job_id, snapshot)
+
+    @contextmanager
+    def stage(self, name: str):
+        start = time.time()
+        with self._lock:
+            self.progress.pop(name, None)  # καθαρό state σε retry
+        self.report(name, status="running", started_at=start, attempt=self.attempt)
+        try:
+            yield
+        except Exception as e:
+            self.report(name, status="failed", error=str(e)[:500],
+                        seconds=round(time.time() - start, 3))
+            raise
+        self.report(name, status="done", seconds=round(time.time() - start, 3))
+
+
+# ----------------------------------------
+# Worker pool
+# ----------------------------------------
+class JobWorkerPool:
+    """Background threads that claim jobs and dispatch them by kind."""
+
+    def __init__(self, queue: JobQueue, handlers: dict, workers: int = JOB_WORKERS):
+        self.queue = queue
+        self.handlers = handlers
+        self.workers = workers
+        self._stop = threading.Event()
+        self._threads = []
+
+    def start(self):
+        recovered = self.queue.recover_orphans()
+        if recovered:
+            print(f"♻️ Requeued {recovered} interrupted job(s)")
+        for i in range(self.workers):
+            t = threading.Thread(target=self._loop, name=f"job-worker-{i}", daemon=True)
+            t.start()
+            self._threads.append(t)
+
+    def stop(self, timeout: float = 5.0):
+        self._stop.set()
+        for t in self._threads:
+            t.join(timeout=timeout)
+        self._threads = []
+
+    def _loop(self):
+        while not self._stop.is_set():
+            try:
+                job = self.queue.claim()
+            except Exception as e:
+                print(f"⚠️ Job claim error: {e}")
+                job = None
+            if job is None:
+                self._stop.wait(JOB_POLL_INTERVAL)
+                continue
+            self.run_job(job)
+
+    def run_job(self, job: dict):
+        handler = self.handlers.get(job["kind"])
+        if handler is None:
+            self.queue.fail(job["id"], f"No handler for job kind {job['kind']}", 1, 1)
+            return
+
+        ctx = JobContext(self.queue, job)
+        # Heartbeat όσο τρέχει ο handler: ένα stage μπορεί να κρατήσει περισσότερο από το lease
+        done = threading.Event()
+        beat = threading.Thread(target=self._heartbeat, args=(job["id"], done),
+                                name=f"job-heartbeat-{job['id'][:8]}", daemon=True)
+        beat.start()
+        try:
+            result = handler(job["payload"], ctx)
+        except Exception as e:
+            print(f"❌ Job {job['id']} ({job['kind']}) attempt {job['attempts']} failed: {e}")
+            error = f"{e}\n{traceback.format_exc(limit=5)}"
+            self.queue.fail(job["id"], error, job["attempts"], job["max_attempts"])
+            return
+        finally:
+            done.set()
+            beat.join()
+        self.queue.complete(job["id"], result)
+
+    def _heartbeat(self, job_id: str, done: threading.Event):
+        while not done.wait(JOB_HEARTBEAT_SECONDS):
+            try:
+                self.queue.heartbeat(job_id)
+            except Exception as e:
+                print(f"⚠️ Job heartbeat error ({job_id}): {e}")
@@ -0,0 +1,93 @@
+import time
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+
+
+# ----------------------------------------
+# Stage graph: ανεξάρτητα stages τρέχουν παράλληλα
+# ----------------------------------------
+class Stage:
+    """
+    One node of a pipeline.
+
+    `func(results)` receives the results of finished stages by name.
+    `when(results)` can skip the stage; `rerun=False` skips it on a job
+    retry if a previous attempt already completed it.
+    """
+
+    def __init__(self, name: str, func, deps=(), when=None, rerun: bool = True):
+        self.name = name
+        self.func = func
+        self.deps = tuple(deps)
+        self.when = when
+        self.rerun = rerun
+
+
+def _run_stage(stage: Stage, results: dict, ctx):
+    start = time.perf_counter()
+    with ctx.stage(stage.name):
+        value = stage.func(results)
+    return value, time.perf_counter() - start
+
+
+def run_stage_graph(stages: list, ctx):
+    """
+    Run stages as soon as their dependencies finish, independent ones
+    concurrently. Returns (results, timings) where timings are seconds
+    per stage plus the wall-clock total. The first stage error is raised
+    after the stages already running have finished.
+    """
+    graph_start = time.perf_counter()
+    pending = {s.name: s for s in stages}
+    results = {}
+    timings = {}
+    running = {}
+    error = None
+
+    with ThreadPoolExecutor(max_workers=max(1, len(stages)),
+                            thread_name_prefix="stage") as pool:
+        while pending or running:
+            launched = True
+            while launched and error is None:
+                launched = False
+                for name, stage in list(pending.items()):
+                    if not all(d in results for d in stage.deps):
+                        continue
+                    del pending[name]
+                    launched = True
+
+                    if stage.when is not None and not stage.when(results):
+                        results[name] = None
+                        ctx.report(name, status="skipped")
+                        continue
+                    if not stage.rerun and ctx.is_done(name):
+                        results[name] = None
+                        ctx.report(name, reused_from_previous_attempt=True)
+                        continue
+
+                    # Αντίγραφο: κάθε stage βλέπει σταθερό snapshot
+                    running[pool.submit(_run_stage, stage, dict(results), ctx)] = stage
+
+            if not running:
+                if pending and error is None:
+                    raise RuntimeError(f"Unsatisfiable stage dependencies: {sorted(pending)}")
+                break
+
+            done, _ = wait(running, return_when=FIRST_COMPLETED)
+            for future in done:
+                stage = running.pop(future)
+                try:
+                    value, seconds = future.result()
+                except Exception as e:
+                    error = error or e
+                    continue
+                results[stage.name] = value
+                timings[stage.name] = round(seconds, 3)
+
+            if error is not None and not running:
+                break
+
+    if error is not None:
+        raise error
+
+    timings["total"] = round(time.perf_counter() - graph_start, 3)
+    return results, timings
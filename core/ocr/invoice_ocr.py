@@ -1,18 +1,50 @@
 import io
 import os
+import json
 import fitz
+import numpy as np
 import pytesseract
 from PIL import Image
-from openai import OpenAI
 from dotenv import load_dotenv
-import base64
 load_dotenv()
 
+from core.executors import get_cpu_executor
+from core.ocr import ocr_cache
+from core.ocr import tesseract_pool
+from core.ocr import vision_client
+
 # -----------------------------------------
 # Setup
 # -----------------------------------------
 pytesseract.pytesseract.tesseract_cmd = r"C:\Program Files\Tesseract-OCR\tesseract.exe"
-client = OpenAI(api_key=os.getenv("OPENAI_API_KEY"))
+
+# Παράλληλο Tesseract ανά σελίδα (process pool, βλ. core.executors.CPU_WORKERS)
+TESSERACT_PAGE_WORKERS = int(os.getenv("TESSERACT_PAGE_WORKERS", str(os.cpu_count() or 1)))
+TESSERACT_DPI = 200
+TESSERACT_LANG = "ell+eng"
+
+# Επιλογή language pack ανά σελίδα (μόνο ell / μόνο eng / και τα δύο)
+TESSERACT_SCRIPT_DETECTION = os.getenv("TESSERACT_SCRIPT_DETECTION", "1") == "1"
+SCRIPT_MIN_LETTERS = 20
+SCRIPT_DOMINANCE = 0.97
+
+# Προεπεξεργασία εικόνας πριν το OCR (ενεργοποιείται και ανά request)
+OCR_PREPROCESS = os.getenv("OCR_PREPROCESS", "0") == "1"
+TARGET_GLYPH_HEIGHT = int(os.getenv("OCR_TARGET_GLYPH_HEIGHT", "40"))  # px ανά γραμμή κειμένου
+THRESHOLD_BLOCK = 31
+THRESHOLD_OFFSET = 10
+MAX_SKEW_DEGREES = 5.0
+MIN_DOWNSCALE = 0.25           # ποτέ μικρότερο από 1/4 του αρχικού
+MAX_BAND_FRACTION = 0.05       # "γραμμές" ψηλότερες από 5% της σελίδας δεν είναι κείμενο
+
+# Tiered OCR: Vision μόνο για σελίδες με χαμηλό score στο Tesseract
+OCR_VISION_THRESHOLD = float(os.getenv("OCR_VISION_THRESHOLD", "0.45"))
+VISION_DPI = 150
+VISION_MAX_PAGES = 20
+
+# Ψηφιακά PDF: σελίδες με χρήσιμο text layer δεν περνάνε από OCR
+TEXT_LAYER_MIN_CHARS = int(os.getenv("TEXT_LAYER_MIN_CHARS", "30"))
+TEXT_LAYER_MIN_SCORE = float(os.getenv("TEXT_LAYER_MIN_SCORE", "0.3"))
 
 
 # -----------------------------------------
@@ -32,28 +64,291 @@ def score_text(text: str) -> float:
     return ratio
 
 
+# -----------------------------------------
+# Shared page rendering (ένα raster ανά σελίδα, streaming)
+# -----------------------------------------
+def pixmap_to_image(pix) -> Image.Image:
+    """PIL image over the pixmap sample buffer (no PNG encode/decode)."""
+    mode = {1: "L", 3: "RGB", 4: "RGBA"}[pix.n]
+    samples = getattr(pix, "samples_mv", None) or pix.samples
+    return Image.frombuffer(mode, (pix.width, pix.height), samples, "raw", mode, pix.stride, 1)
+
+
+class RenderedPage:
+    """One rendered page; the PIL view is produced on demand."""
+
+    def __init__(self, page_num: int, pix):
+        self.page_num = page_num
+        self.pix = pix  # κρατάει ζωντανό το buffer του PIL image
+        self._image = None
+
+    def image(self) -> Image.Image:
+        if self._image is None:
+            self._image = pixmap_to_image(self.pix)
+        return self._image
+
+
+def render_pages(pdf, page_numbers: list, dpi: int):
+    """
+    Yield a RenderedPage per requested page, one at a time, so a long
+    PDF never holds every raster in memory. `pdf` is a path or an open
+    fitz document.
+    """
+    own = isinstance(pdf, (str, os.PathLike))
+    doc = fitz.open(pdf) if own else pdf
+    try:
+        for page_num in page_numbers:
+            yield RenderedPage(page_num, doc[page_num].get_pixmap(dpi=dpi))
+    finally:
+        if own:
+            doc.close()
+
+
+# -----------------------------------------
+# IMAGE PREPROCESSING (NumPy)
+# -----------------------------------------
+def to_grayscale(arr: np.ndarray) -> np.ndarray:
+    """ITU-R 601 luma, returns float32 H×W."""
+    if arr.ndim == 2:
+        return arr.astype(np.float32)
+    rgb = arr[..., :3].astype(np.float32)
+    return rgb @ np.array([0.299, 0.587, 0.114], dtype=np.float32)
+
+
+def image_to_gray(img: Image.Image) -> np.ndarray:
+    """Grayscale array for any PIL mode (palette and LA images are converted first)."""
+    if img.mode not in ("L", "RGB", "RGBA"):
+        img = img.convert("L" if img.mode in ("1", "LA", "I", "I;16", "F") else "RGB")
+    return to_grayscale(np.asarray(img))
+
+
+def adaptive_threshold(gray: np.ndarray, block: int = THRESHOLD_BLOCK,
+                       offset: float = THRESHOLD_OFFSET) -> np.ndarray:
+    """
+    Local-mean binarization via an integral image: a pixel is ink (0)
+    when it is darker than its block mean minus `offset`, else paper (255).
+    """
+    h, w = gray.shape
+    pad = block // 2
+    padded = np.pad(gray.astype(np.float64), pad, mode="edge")
+    integral = np.zeros((padded.shape[0] + 1, padded.shape[1] + 1), dtype=np.float64)
+    integral[1:, 1:] = padded.cumsum(axis=0).cumsum(axis=1)
+
+    window = (
+        integral[block:block + h, block:block + w]
+        - integral[0:h, block:block + w]
+        - integral[block:block + h, 0:w]
+        + integral[0:h, 0:w]
+    )
+    mean = window / (block * block)
+    return np.where(gray > mean - offset, 255, 0).astype(np.uint8)
+
+
+def estimate_glyph_height(binary: np.ndarray, max_fraction: float = MAX_BAND_FRACTION) -> float:
+    """
+    Median height (px) of the horizontal text bands in a binary page.
+    Bands taller than `max_fraction` of the page (merged lines, photos,
+    frames) are ignored.
+    """
+    ink_rows = (binary == 0).mean(axis=1) > 0.002
+    edges = np.diff(np.concatenate(([0], ink_rows.astype(np.int8), [0])))
+    heights = np.flatnonzero(edges == -1) - np.flatnonzero(edges == 1)
+    heights = heights[(heights >= 3) & (heights <= max(3, binary.shape[0] * max_fraction))]
+    return float(np.median(heights)) if heights.size else 0.0
+
+
+def estimate_skew(binary: np.ndarray, max_angle: float = MAX_SKEW_DEGREES,
+                  step: float = 0.25) -> float:
+    """
+    Skew angle in degrees by projection profile: the shear that makes
+    the row histogram of ink pixels sharpest aligns the text lines.
+    """
+    ys, xs = np.nonzero(binary == 0)
+    if ys.size < 100:
+        return 0.0
+    if ys.size > 200_000:
+        pick = np.random.default_rng(0).choice(ys.size, 200_000, replace=False)
+        ys, xs = ys[pick], xs[pick]
+
+    best_angle, best_score = 0.0, -1.0
+    for angle in np.arange(-max_angle, max_angle + step / 2, step):
+        rows = np.round(ys - xs * np.tan(np.radians(angle))).astype(np.int64)
+        hist = np.bincount(rows - rows.min()).astype(np.float64)
+        score = float(np.dot(hist, hist))
+        if score > best_score:
+            best_angle, best_score = float(angle), score
+    return best_angle
+
+
+def preprocess_image(img: Image.Image) -> Image.Image:
+    """
+    Grayscale → adaptive threshold → deskew → downscale to
+    TARGET_GLYPH_HEIGHT. Returns a binary "L" image ready for either OCR
+    engine.
+
+    Glyph height is measured after deskew: on a tilted page the text lines
+    overlap in the row projection and look like one page-high band.
+    """
+    gray = image_to_gray(img)
+    binary = adaptive_threshold(gray)
+
+    angle = estimate_skew(binary)
+    if abs(angle) >= 0.25:
+        rotated = Image.fromarray(gray.clip(0, 255).astype(np.uint8)).rotate(
+            angle, resample=Image.BILINEAR, expand=True, fillcolor=255)
+        gray = np.asarray(rotated, dtype=np.float32)
+        binary = adaptive_threshold(gray)
+
+    glyph = estimate_glyph_height(binary)
+    if glyph > TARGET_GLYPH_HEIGHT * 1.2:
+        scale = max(MIN_DOWNSCALE, TARGET_GLYPH_HEIGHT / glyph)
+        size = (max(1, int(gray.shape[1] * scale)), max(1, int(gray.shape[0] * scale)))
+        small = Image.fromarray(gray.clip(0, 255).astype(np.uint8)).resize(size, Image.LANCZOS)
+        binary = adaptive_threshold(np.asarray(small, dtype=np.float32))
+
+    return Image.fromarray(binary, mode="L")
+
+
+def has_usable_text_layer(text: str) -> bool:
+    """True if an embedded text layer is long and readable enough to skip OCR."""
+    stripped = text.strip()
+    return len(stripped) >= TEXT_LAYER_MIN_CHARS and score_text(stripped) >= TEXT_LAYER_MIN_SCORE
+
+
+# -----------------------------------------
+# SCRIPT DETECTION (Greek / Latin)
+# -----------------------------------------
+def script_histogram(text: str) -> dict:
+    """Count Greek and Latin letters in a text."""
+    greek = latin = 0
+    for c in text:
+        if not c.isalpha():
+            continue
+        code = ord(c)
+        if 0x0370 <= code <= 0x03FF or 0x1F00 <= code <= 0x1FFF:
+            greek += 1
+        elif code < 0x0250:
+            latin += 1
+    return {"greek": greek, "latin": latin}
+
+
+def choose_languages(text: str):
+    """
+    Minimal Tesseract language set for a text sample: "ell", "eng", or
+    "ell+eng" for mixed pages. None if the sample is too small to tell.
+    """
+    hist = script_histogram(text or "")
+    total = hist["greek"] + hist["latin"]
+    if total < SCRIPT_MIN_LETTERS:
+        return None
+    if hist["greek"] / total >= SCRIPT_DOMINANCE:
+        return "ell"
+    if hist["latin"] / total >= SCRIPT_DOMINANCE:
+        return "eng"
+    return TESSERACT_LANG
+
+
+def tesseract_ocr_image(img: Image.Image, hint: str = "", document_lang: str = None) -> tuple:
+    """
+    OCR one raster with the smallest language set that fits the page.
+
+    The script is taken from `hint` (e.g. a partial text layer), from
+    `document_lang` (detected on an earlier page of the same document) or,
+    with warm tesserocr engines, from a cheap OCR pass on a half-resolution
+    copy. Otherwise the page is read once with TESSERACT_LANG and that text
+    is kept; its script is returned as "detected" for the next pages.
+    Returns (text, {"lang": ..., "lang_source": ...}).
+    """
+    if not TESSERACT_SCRIPT_DETECTION:
+        return tesseract_pool.image_to_string(img, TESSERACT_LANG), \
+            {"lang": TESSERACT_LANG, "lang_source": "fixed"}
+
+    lang, source = choose_languages(hint), "text_layer"
+    if lang is None and document_lang:
+        lang, source = document_lang, "document"
+    # Quick pass μόνο με ζεστό engine· με pytesseract κάθε κλήση = νέο process
+    if lang is None and tesseract_pool.backend_name() == "tesserocr" and min(img.size) >= 200:
+        quick = tesseract_pool.image_to_string(img.reduce(2), TESSERACT_LANG)
+        lang, source = choose_languages(quick), "quick_pass"
+    if lang is None:
+        text = tesseract_pool.image_to_string(img, TESSERACT_LANG)
+        return text, {"lang": TESSERACT_LANG, "lang_source": "default",
+                      "detected": choose_languages(text)}
+
+    return tesseract_pool.image_to_string(img, lang), {"lang": lang, "lang_source": source}
+
+
 # -----------------------------------------
 # TESSERACT OCR
 # -----------------------------------------
-def ocr_image_tesseract(image_bytes: bytes) -> str:
+def ocr_image_tesseract_detailed(image_bytes: bytes, preprocess: bool = False) -> tuple:
     try:
         img = Image.open(io.BytesIO(image_bytes))
-        return pytesseract.image_to_string(img, lang="ell+eng")
+        if preprocess:
+            img = preprocess_image(img)
+        return tesseract_ocr_image(img)
     except Exception:
-        return ""
+        return "", {}
 
 
-def ocr_pdf_tesseract(path: str) -> str:
-    text = ""
+def ocr_image_tesseract(image_bytes: bytes, preprocess: bool = False) -> str:
+    return ocr_image_tesseract_detailed(image_bytes, preprocess)[0]
+
+
+def ocr_pdf_pages_tesseract(path: str, page_numbers: list, dpi: int = TESSERACT_DPI,
+                            preprocess: bool = False, hints: dict = None) -> list:
+    """OCR selected pages of a PDF; returns [(page_number, text, lang_info), ...]."""
+    hints = hints or {}
+    results = []
+    document_lang = None
+    for page in render_pages(path, page_numbers, dpi):
+        img = preprocess_image(page.image()) if preprocess else page.image()
+        text, info = tesseract_ocr_image(img, hints.get(page.page_num, ""), document_lang)
+        # Η γλώσσα της πρώτης σελίδας χωρίς hint ισχύει για τις επόμενες
+        if document_lang is None:
+            document_lang = info.get("detected") or (
+                info["lang"] if info.get("lang_source") == "quick_pass" else None)
+        results.append((page.page_num, text, info))
+    return results
+
+
+def tesseract_pdf_pages(path: str, page_numbers: list, workers: int = None,
+                        preprocess: bool = False, hints: dict = None) -> list:
+    """
+    Tesseract OCR for the given PDF pages; returns [(text, lang_info), ...]
+    in page order. `hints` maps page number → partial text layer used for
+    script detection.
+
+    With workers > 1 the pages are spread over the process pool
+    (interleaved, so slow pages are shared out) and reassembled in
+    page order.
+    """
+    workers = TESSERACT_PAGE_WORKERS if workers is None else workers
+    groups = min(max(1, workers), len(page_numbers))
+    hints = hints or {}
+    if groups <= 1:
+        pages = ocr_pdf_pages_tesseract(path, page_numbers, preprocess=preprocess, hints=hints)
+    else:
+        executor = get_cpu_executor()
+        futures = []
+        for g in range(groups):
+            group = page_numbers[g::groups]
+            futures.append(executor.submit(
+                ocr_pdf_pages_tesseract, path, group, TESSERACT_DPI, preprocess,
+                {p: hints[p] for p in group if p in hints}
+            ))
+        pages = [item for f in futures for item in f.result()]
+
+    pages.sort(key=lambda item: item[0])
+    return [(page_text, info) for _, page_text, info in pages]
+
+
+def ocr_pdf_tesseract(path: str, workers: int = None) -> str:
     try:
-        pdf = fitz.open(path)
-        for page in pdf:
-            pix = page.get_pixmap(dpi=200)
-            img_bytes = pix.tobytes("png")
-            img = Image.open(io.BytesIO(img_bytes))
-            page_text = pytesseract.image_to_string(img, lang="ell+eng")
-            text += "\n" + page_text
-        return text
+        with fitz.open(path) as pdf:
+            page_count = len(pdf)
+        pages = tesseract_pdf_pages(path, list(range(page_count)), workers)
+        return "".join("\n" + page_text for page_text, _ in pages)
     except Exception:
         return ""
 
@@ -61,123 +356,221 @@ def ocr_pdf_tesseract(path: str) -> str:
 # -----------------------------------------
 # OPENAI OCR (Vision)
 # -----------------------------------------
-def openai_ocr_image(image_bytes: bytes) -> str:
-    """OCR για εικόνα με OpenAI Vision."""
-    try:
-        # Encode to base64
-        base64_image = base64.b64encode(image_bytes).decode('utf-8')
-        
-        response = client.chat.completions.create(
-            model="gpt-4o-mini",  # ή "gpt-4o" για καλύτερο OCR
-            messages=[
-                {
-                    "role": "user",
-                    "content": [
-                        {"type": "text", "text": "Extract all text from this image."},
-                        {
-                            "type": "image_url",
-                            "image_url": {
-                                "url": f"data:image/png;base64,{base64_image}"
-                            }
-                        }
-                    ]
-                }
-            ],
-            max_tokens=2000
-        )
-        return response.choices[0].message.content or ""
-    except Exception as e:
-        print(f"[ERROR] OpenAI OCR failed: {e}")
-        return ""
+def openai_ocr_image(image) -> str:
+    """OCR για εικόνα (bytes ή PIL) με OpenAI Vision (βλ. vision_client)."""
+    return vision_client.vision_ocr(image)
+
+
+def _vision_payloads(pdf, page_numbers, preprocess: bool = False):
+    """Compact Vision payload per page, rendered lazily at VISION_DPI."""
+    for page in render_pages(pdf, page_numbers, VISION_DPI):
+        img = preprocess_image(page.image()) if preprocess else page.image()
+        # συμπίεση εδώ: το raster ζει μόνο όσο το pixmap της σελίδας
+        yield vision_client.compact_image(img)
+
+
+def openai_ocr_pdf_pages(pdf, page_numbers: list, preprocess: bool = False) -> dict:
+    """
+    Vision OCR for several pages of an open PDF, sent concurrently
+    (VISION_CONCURRENCY) through the shared rate limiter. Returns
+    {page_number: text}.
+    """
+    page_numbers = list(page_numbers)
+    texts = vision_client.vision_ocr_many(_vision_payloads(pdf, page_numbers, preprocess))
+    return dict(zip(page_numbers, texts))
 
 
 def openai_ocr_pdf(path: str) -> str:
-    """OCR για PDF - βελτιωμένη έκδοση."""
+    """OCR για PDF - όλες οι σελίδες (μέχρι VISION_MAX_PAGES) παράλληλα."""
     text = ""
     try:
-        pdf = fitz.open(path)
-        
-        # Περίγραψε το max pages για να μην κολλάει
-        max_pages = min(20, len(pdf))  # Μέχρι 20 σελίδες
-        
+        with fitz.open(path) as pdf:
+            max_pages = min(VISION_MAX_PAGES, len(pdf))
+            texts = openai_ocr_pdf_pages(pdf, range(max_pages))
+
         for page_num in range(max_pages):
-            page = pdf[page_num]
-            
-            # Μείωσε DPI για ταχύτερη επεξεργασία
-            pix = page.get_pixmap(dpi=150)
-            img_bytes = pix.tobytes("png")
-            
-            page_text = openai_ocr_image(img_bytes)
-            if page_text:
-                text += f"\n--- Page {page_num + 1} ---\n{page_text}\n"
-            
-            # Προαιρετικό: Προσθήκη delay για rate limits
-            import time
-            if page_num % 5 == 0:
-                time.sleep(0.5)
-        
+            if texts[page_num]:
+                text += f"\n--- Page {page_num + 1} ---\n{texts[page_num]}\n"
         return text
-        
+
     except Exception as e:
         print(f"[ERROR] PDF OCR failed: {e}")
         return ""
 
 
 # -----------------------------------------
-# MAIN HYBRID OCR FUNCTION
+# MAIN HYBRID OCR FUNCTION (tiered, per page)
 # -----------------------------------------
-def ocr_to_text(path: str, filename: str) -> str:
-    print("[DEBUG] ocr_to_text START")
+def _pick_page(page_num: int, t_text: str, o_text: str = None) -> dict:
+    score_t = score_text(t_text)
+    page = {"page": page_num + 1, "path": "ocr", "engine": "tesseract",
+            "score": round(score_t, 3), "text": t_text, "tesseract_score": round(score_t, 3)}
+    if o_text is not None:
+        score_o = score_text(o_text)
+        page["vision_score"] = round(score_o, 3)
+        if score_o > score_t:
+            page.update(engine="vision", score=round(score_o, 3), text=o_text)
+    return page
+
+
+def _engine_key(engine: str, preprocess: bool) -> str:
+    """Cache engine name; preprocessed OCR is a different result."""
+    return f"{engine}+pp" if preprocess else engine
+
 
+def _cached_vision_pages(pdf, content_hash: str, page_numbers: list,
+                         preprocess: bool = False) -> dict:
+    """{page: text} — cached pages first, the rest sent to Vision concurrently."""
+    engine = _engine_key("vision", preprocess)
+    texts = ocr_cache.get_cached_pages(content_hash, page_numbers, engine, VISION_DPI, "auto")
+    missing = [p for p in page_numbers if p not in texts]
+    if missing:
+        fresh = openai_ocr_pdf_pages(pdf, missing, preprocess)
+        # αποτυχίες ("") δεν αποθηκεύονται
+        ocr_cache.store_pages(content_hash, {p: t for p, t in fresh.items() if t},
+                              engine, VISION_DPI, "auto")
+        texts.update(fresh)
+    return texts
+
+
+def _tesseract_lang_key() -> str:
+    """Language part of the cache key ("auto" when chosen per page)."""
+    return "auto" if TESSERACT_SCRIPT_DETECTION else TESSERACT_LANG
+
+
+def _cached_tesseract_pages(path: str, content_hash: str, page_numbers: list,
+                            preprocess: bool = False, hints: dict = None) -> dict:
+    """{page: (text, lang_info)} — cached pages first, the rest OCRed."""
+    engine = _engine_key("tesseract", preprocess)
+    lang_key = _tesseract_lang_key()
+    texts = ocr_cache.get_cached_pages(content_hash, page_numbers, engine, TESSERACT_DPI, lang_key)
+    infos = ocr_cache.get_cached_pages(content_hash, list(texts), engine + ":lang", TESSERACT_DPI, lang_key)
+    results = {p: (t, {**json.loads(infos.get(p, "{}")), "cached": True}) for p, t in texts.items()}
+
+    missing = [p for p in page_numbers if p not in texts]
+    if missing:
+        fresh = dict(zip(missing, tesseract_pdf_pages(path, missing, preprocess=preprocess, hints=hints)))
+        ocr_cache.store_pages(content_hash, {p: t for p, (t, _) in fresh.items()},
+                              engine, TESSERACT_DPI, lang_key)
+        ocr_cache.store_pages(content_hash, {p: json.dumps(i) for p, (_, i) in fresh.items()},
+                              engine + ":lang", TESSERACT_DPI, lang_key)
+        results.update(fresh)
+    return results
+
+
+def ocr_document(path: str, filename: str, vision_threshold: float = None,
+                 content_hash: str = None, preprocess: bool = None) -> dict:
+    """
+    Tiered hybrid OCR.
+
+    PDF pages with a usable embedded text layer are extracted directly
+    (path "text_layer"). The remaining pages go through Tesseract first;
+    only those whose score_text falls below `vision_threshold` are sent
+    to OpenAI Vision, and the better of the two texts is kept per page.
+    Returns the merged text plus per-page metadata (path, winning engine,
+    scores).
+
+    With `preprocess` (default OCR_PREPROCESS) every raster goes through
+    preprocess_image() before either engine sees it.
+
+    OCR output is cached per (content hash, page, engine, DPI, language).
+    """
+    threshold = OCR_VISION_THRESHOLD if vision_threshold is None else vision_threshold
+    preprocess = OCR_PREPROCESS if preprocess is None else preprocess
     filename = filename.lower()
+    is_image = filename.endswith((".jpg", ".jpeg", ".png"))
 
-    # Load bytes
+    pages = []
     try:
-        with open(path, "rb") as f:
-            file_bytes = f.read()
-        print("[DEBUG] File loaded")
+        content_hash = content_hash or ocr_cache.file_sha256(path)
+
+        if is_image:
+            with open(path, "rb") as f:
+                file_bytes = f.read()
+
+            t_engine = _engine_key("tesseract", preprocess)
+            lang_key = _tesseract_lang_key()
+            cached = ocr_cache.get_cached_pages(content_hash, [0], t_engine, "image", lang_key)
+            t_text = cached.get(0)
+            if t_text is None:
+                t_text, t_info = ocr_image_tesseract_detailed(file_bytes, preprocess)
+                if t_text:
+                    ocr_cache.store_pages(content_hash, {0: t_text}, t_engine, "image", lang_key)
+                    ocr_cache.store_pages(content_hash, {0: json.dumps(t_info)},
+                                          t_engine + ":lang", "image", lang_key)
+            else:
+                info = ocr_cache.get_cached_pages(content_hash, [0], t_engine + ":lang", "image", lang_key)
+                t_info = {**json.loads(info.get(0, "{}")), "cached": True}
+
+            o_text = None
+            if score_text(t_text) < threshold:
+                o_engine = _engine_key("vision", preprocess)
+                cached = ocr_cache.get_cached_pages(content_hash, [0], o_engine, "image", "auto")
+                o_text = cached.get(0)
+                if o_text is None:
+                    if preprocess:
+                        payload = preprocess_image(Image.open(io.BytesIO(file_bytes)))
+                    else:
+                        payload = file_bytes
+                    o_text = openai_ocr_image(payload)
+                    if o_text:
+                        ocr_cache.store_pages(content_hash, {0: o_text}, o_engine, "image", "auto")
+            pages.append({**_pick_page(0, t_text, o_text), **t_info})
+        else:
+            with fitz.open(path) as pdf:
+                page_count = len(pdf)
+                layers = [pdf[i].get_text("text") for i in range(page_count)]
+                ocr_pages = [i for i in range(page_count) if not has_usable_text_layer(layers[i])]
+
+                t_texts = {}
+                if ocr_pages:
+                    # Ακόμα και ένα ελλιπές text layer βοηθάει στην επιλογή γλώσσας
+                    hints = {i: layers[i] for i in ocr_pages if layers[i].strip()}
+                    try:
+                        t_texts = _cached_tesseract_pages(path, content_hash, ocr_pages, preprocess, hints)
+                    except Exception as e:
+                        print(f"[DEBUG] Tesseract failed: {e}")
+                        t_texts = {i: ("", {}) for i in ocr_pages}
+
+                # Vision για τις σελίδες κάτω από το threshold, όλες μαζί
+                low = [p for p in ocr_pages if score_text(t_texts[p][0]) < threshold]
+                o_texts = _cached_vision_pages(pdf, content_hash, low[:VISION_MAX_PAGES], preprocess)
+
+                for page_num in range(page_count):
+                    if page_num not in t_texts:
+                        pages.append({
+                            "page": page_num + 1,
+                            "path": "text_layer",
+                            "engine": "text_layer",
+                            "score": round(score_text(layers[page_num]), 3),
+                            "text": layers[page_num],
+                        })
+                        continue
+
+                    t_text, t_info = t_texts[page_num]
+                    pages.append({**_pick_page(page_num, t_text, o_texts.get(page_num)), **t_info})
     except Exception as e:
-        print("[DEBUG] FAILED to load file:", e)
-        return ""
+        print(f"[DEBUG] OCR failed: {e}")
+        return {"text": "", "pages": [], "engines": {}}
 
-    is_image = filename.endswith((".jpg", ".jpeg", ".png"))
-    is_pdf = filename.endswith(".pdf")
-
-    # -----------------------
-    # 1) Tesseract OCR
-    # -----------------------
-    print("[DEBUG] Running Tesseract...")
-    if is_image:
-        t_text = ocr_image_tesseract(file_bytes)
-    else:
-        t_text = ocr_pdf_tesseract(path)
-    print("[DEBUG] Tesseract DONE (length:", len(t_text), ")")
-
-    # -----------------------
-    # 2) OpenAI OCR
-    # -----------------------
-    print("[DEBUG] Running OpenAI OCR...")
-    if is_image:
-        o_text = openai_ocr_image(file_bytes)
+    if len(pages) == 1:
+        text = pages[0]["text"]
     else:
-        o_text = openai_ocr_pdf(path)
-    print("[DEBUG] OpenAI OCR DONE (length:", len(o_text), ")")
+        text = "".join(f"\n--- Page {p['page']} ---\n{p['text']}\n" for p in pages)
 
-    # -----------------------
-    # 3) SCORE
-    # -----------------------
-    print("[DEBUG] Scoring...")
-    score_t = score_text(t_text)
-    score_o = score_text(o_text)
-    print("[DEBUG] Scoring DONE")
-    print(f"[DEBUG] Scores → Tesseract: {score_t:.3f}, OpenAI: {score_o:.3f}")
-
-    # -----------------------
-    # 4) PICK BEST
-    # -----------------------
-    if score_o > score_t:
-        print("[DEBUG] SELECTED: OpenAI OCR")
-        return o_text
-
-    print("[DEBUG] SELECTED: Tesseract OCR")
-    return t_text
+    engines = {}
+    for p in pages:
+        engines[p["engine"]] = engines.get(p["engine"], 0) + 1
+
+    print(f"[DEBUG] OCR pages → {engines}")
+    return {
+        "text": text,
+        "content_hash": content_hash,
+        "preprocess": preprocess,
+        "pages": [{k: v for k, v in p.items() if k != "text"} for p in pages],
+        "engines": engines,
+    }
+
+
+def ocr_to_text(path: str, filename: str, preprocess: bool = None) -> str:
+    return ocr_document(path, filename, preprocess=preprocess)["text"]
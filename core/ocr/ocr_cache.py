@@ -0,0 +1,77 @@
+# core/ocr/ocr_cache.py
+"""
+Persistent OCR result cache.
+
+Keyed by (content hash, page index, engine, DPI, language) so a
+re-upload or re-parse of the same file never runs OCR twice.
+
+CLI:
+    python -m core.ocr.ocr_cache stats
+    python -m core.ocr.ocr_cache purge [--hash <sha256>]
+"""
+import os
+import sys
+import json
+import hashlib
+import argparse
+
+from core.cache.disk_cache import DiskLRUCache
+
+OCR_CACHE_MAX_MB = int(os.getenv("OCR_CACHE_MAX_MB", "1024"))
+
+ocr_cache = DiskLRUCache("ocr.sqlite3", OCR_CACHE_MAX_MB * 1024 * 1024)
+
+
+def file_sha256(path: str, block_size: int = 1024 * 1024) -> str:
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(block_size), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def ocr_cache_key(content_hash: str, page: int, engine: str, dpi, lang: str) -> str:
+    return f"{content_hash}:{page}:{engine}:{dpi}:{lang}"
+
+
+def get_cached_pages(content_hash: str, pages: list, engine: str, dpi, lang: str) -> dict:
+    """{page: text} for the pages already in the cache."""
+    keys = {ocr_cache_key(content_hash, p, engine, dpi, lang): p for p in pages}
+    found = ocr_cache.get_many(list(keys))
+    return {keys[k]: v.decode("utf-8") for k, v in found.items()}
+
+
+def store_pages(content_hash: str, texts: dict, engine: str, dpi, lang: str):
+    ocr_cache.set_many({
+        ocr_cache_key(content_hash, page, engine, dpi, lang): text.encode("utf-8")
+        for page, text in texts.items()
+    })
+
+
+def purge(content_hash: str = None) -> int:
+    """Remove every cached page (or only those of one file)."""
+    if content_hash:
+        return ocr_cache.delete_prefix(f"{content_hash}:")
+    count = ocr_cache.stats()["entries"]
+    ocr_cache.clear()
+    return count
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="AInteG OCR cache")
+    sub = parser.add_subparsers(dest="command", required=True)
+    sub.add_parser("stats", help="show cache size and entries")
+    purge_cmd = sub.add_parser("purge", help="delete cached OCR results")
+    purge_cmd.add_argument("--hash", help="only purge pages of this content hash")
+    args = parser.parse_args(argv)
+
+    if args.command == "stats":
+        print(json.dumps(ocr_cache.stats(), indent=2))
+    elif args.command == "purge":
+        removed = purge(args.hash)
+        print(f"🧹 Removed {removed} cached OCR page(s)")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
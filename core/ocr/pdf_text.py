@@ -0,0 +1,17 @@
+import pdfplumber
+
+
+def extract_pdf_text(path: str) -> str:
+    """
+    Text layer extraction with pdfplumber.
+
+    Kept in its own light module so it can run in the process pool
+    without importing OCR/RAG clients in every worker.
+    """
+    text = ""
+    with pdfplumber.open(path) as pdf:
+        for page in pdf.pages:
+            page_text = page.extract_text()
+            if page_text:
+                text += page_text + "\n"
+    return text
@@ -0,0 +1,126 @@
+# core/ocr/tesseract_pool.py
+"""
+Warm Tesseract engines.
+
+With the optional `tesserocr` bindings installed, long-lived
+PyTessBaseAPI instances are kept in a per-process pool, so the
+traineddata is loaded once per engine instead of once per page. Each
+process-pool worker therefore keeps its own warm engine(s). Without
+tesserocr (or if it fails) pytesseract is used as before.
+"""
+import os
+import queue
+import threading
+from contextlib import contextmanager
+
+import pytesseract
+
+try:
+    import tesserocr
+except ImportError:  # optional dependency
+    tesserocr = None
+
+# auto | tesserocr | pytesseract
+TESSERACT_BACKEND = os.getenv("TESSERACT_BACKEND", "auto")
+TESSERACT_POOL_SIZE = int(os.getenv("TESSERACT_POOL_SIZE", "2"))
+TESSDATA_DIR = os.getenv("TESSDATA_DIR")
+
+
+class TesseractEnginePool:
+    """Up to `size` warm engines per language, borrowed one at a time."""
+
+    def __init__(self, size: int = TESSERACT_POOL_SIZE):
+        self.size = max(1, size)
+        self._idle = {}
+        self._created = {}
+        self._lock = threading.Lock()
+
+    def _new_engine(self, lang: str):
+        if TESSDATA_DIR:
+            return tesserocr.PyTessBaseAPI(path=TESSDATA_DIR, lang=lang)
+        return tesserocr.PyTessBaseAPI(lang=lang)
+
+    @contextmanager
+    def engine(self, lang: str):
+        with self._lock:
+            idle = self._idle.setdefault(lang, queue.LifoQueue())
+            create = idle.empty() and self._created.get(lang, 0) < self.size
+            if create:
+                self._created[lang] = self._created.get(lang, 0) + 1
+
+        if create:
+            try:
+                api = self._new_engine(lang)
+            except Exception:
+                with self._lock:
+                    self._created[lang] -= 1
+                raise
+        else:
+            api = idle.get()
+
+        healthy = True
+        try:
+            yield api
+        except Exception:
+            healthy = False
+            raise
+        finally:
+            if healthy:
+                idle.put(api)
+            else:
+                # Χαλασμένο engine: κλείσ' το, θα φτιαχτεί νέο
+                try:
+                    api.End()
+                except Exception:
+                    pass
+                with self._lock:
+                    self._created[lang] -= 1
+
+    def close(self):
+        with self._lock:
+            for idle in self._idle.values():
+                while not idle.empty():
+                    idle.get().End()
+            self._idle.clear()
+            self._created.clear()
+
+
+_pool = None
+_pool_lock = threading.Lock()
+
+
+def get_pool() -> TesseractEnginePool:
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            _pool = TesseractEnginePool()
+        return _pool
+
+
+def close_pool():
+    """End the warm engines of this process (app shutdown)."""
+    global _pool
+    with _pool_lock:
+        if _pool is not None:
+            _pool.close()
+            _pool = None
+
+
+def backend_name() -> str:
+    if TESSERACT_BACKEND == "pytesseract" or tesserocr is None:
+        return "pytesseract"
+    return "tesserocr"
+
+
+def image_to_string(img, lang: str) -> str:
+    """Same contract as pytesseract.image_to_string, on a pooled engine if possible."""
+    if backend_name() == "tesserocr":
+        try:
+            with get_pool().engine(lang) as api:
+                api.SetImage(img)
+                return api.GetUTF8Text()
+        except Exception as e:
+            if TESSERACT_BACKEND == "tesserocr":
+                raise
+            print(f"⚠️ tesserocr failed, falling back to pytesseract: {e}")
+    return pytesseract.image_to_string(img, lang=lang)
@@ -0,0 +1,294 @@
+# core/ocr/vision_client.py
+"""
+Rate-limited OpenAI Vision OCR with compact image payloads.
+
+Every Vision request in the process goes through one adaptive token
+bucket: a 429 halves the request rate and pauses all callers for the
+Retry-After period, successful calls slowly raise the rate again. Pages
+are fanned out on core.executors.vision_executor (VISION_CONCURRENCY).
+
+Before upload every image is compacted: grayscale, blank margins
+cropped, re-encoded as JPEG/WebP at VISION_QUALITY, and very tall pages
+split into overlapping tiles sent in the same request.
+
+VISION_BASE_URL points the client at another endpoint, e.g. the local
+stub in vision_stub.py for latency / rate-limit testing.
+"""
+import io
+import os
+import time
+import random
+import base64
+import threading
+
+import numpy as np
+import openai
+from openai import OpenAI
+from PIL import Image
+from dotenv import load_dotenv
+load_dotenv()
+
+from core.executors import vision_executor
+
+# ----------------------------------------
+# Settings
+# ----------------------------------------
+VISION_MODEL = os.getenv("VISION_MODEL", "gpt-4o-mini")  # ή "gpt-4o" για καλύτερο OCR
+VISION_BASE_URL = os.getenv("VISION_BASE_URL") or None
+VISION_RATE = float(os.getenv("VISION_RATE", "2"))          # requests / second
+VISION_BURST = int(os.getenv("VISION_BURST", "4"))
+VISION_MIN_RATE = float(os.getenv("VISION_MIN_RATE", "0.2"))
+VISION_MAX_RETRIES = int(os.getenv("VISION_MAX_RETRIES", "5"))
+VISION_RETRY_BASE = float(os.getenv("VISION_RETRY_BASE", "1"))  # seconds, doubles per retry
+VISION_TIMEOUT = float(os.getenv("VISION_TIMEOUT", "120"))
+
+# Payload compaction
+VISION_FORMAT = os.getenv("VISION_FORMAT", "jpeg").lower()        # jpeg | webp | png
+VISION_QUALITY = int(os.getenv("VISION_QUALITY", "70"))
+VISION_MIN_QUALITY = 35
+VISION_MAX_PART_KB = int(os.getenv("VISION_MAX_PART_KB", "0"))     # 0 = χωρίς όριο
+VISION_GRAYSCALE = os.getenv("VISION_GRAYSCALE", "1") == "1"
+VISION_CROP_MARGINS = os.getenv("VISION_CROP_MARGINS", "1") == "1"
+VISION_TILE_ASPECT = float(os.getenv("VISION_TILE_ASPECT", "2.0"))  # ύψος/πλάτος, 0 = χωρίς tiling
+CROP_INK_LEVEL = 230       # pixels πιο σκούρα από αυτό θεωρούνται περιεχόμενο
+CROP_PADDING = 16
+TILE_OVERLAP = 48
+
+# Τα retries γίνονται εδώ (με τον limiter), όχι μέσα στο SDK
+client = OpenAI(
+    api_key=os.getenv("OPENAI_API_KEY"),
+    base_url=VISION_BASE_URL,
+    max_retries=0,
+    timeout=VISION_TIMEOUT,
+)
+
+
+# ----------------------------------------
+# Adaptive token bucket
+# ----------------------------------------
+class TokenBucket:
+    """
+    Thread-safe token bucket whose rate adapts to the server.
+
+    `acquire()` blocks until a token is available. `throttle(retry_after)`
+    halves the rate and blocks everyone until the server's Retry-After has
+    passed; `success()` adds back a fraction of the lost rate.
+    """
+
+    def __init__(self, rate: float, burst: int, min_rate: float):
+        self.max_rate = rate
+        self.rate = rate
+        self.min_rate = min(min_rate, rate)
+        self.capacity = max(1, burst)
+        self.tokens = float(self.capacity)
+        self.paused_until = 0.0
+        self.throttled = 0
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def _refill(self, now: float):
+        self.tokens = min(self.capacity, self.tokens + (now - self._updated) * self.rate)
+        self._updated = now
+
+    def acquire(self):
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self._refill(now)
+                if now >= self.paused_until and self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+                wait = max(self.paused_until - now, (1 - self.tokens) / self.rate)
+            time.sleep(wait)
+
+    def throttle(self, retry_after: float):
+        with self._lock:
+            now = time.monotonic()
+            self.rate = max(self.min_rate, self.rate / 2)
+            self.tokens = 0.0
+            self._updated = now
+            self.paused_until = max(self.paused_until, now + retry_after)
+            self.throttled += 1
+
+    def success(self):
+        with self._lock:
+            if self.rate < self.max_rate:
+                self.rate = min(self.max_rate, self.rate + 0.1 * self.max_rate)
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "rate": round(self.rate, 3),
+                "max_rate": self.max_rate,
+                "throttled": self.throttled,
+                "paused_for": round(max(0.0, self.paused_until - time.monotonic()), 3),
+            }
+
+
+limiter = TokenBucket(VISION_RATE, VISION_BURST, VISION_MIN_RATE)
+
+
+def _retry_after(error, attempt: int) -> float:
+    """Seconds to wait: the server's Retry-After header, else exponential backoff."""
+    response = getattr(error, "response", None)
+    headers = getattr(response, "headers", None) or {}
+    for name in ("retry-after-ms", "retry-after"):
+        value = headers.get(name)
+        if value:
+            try:
+                seconds = float(value)
+            except ValueError:
+                continue
+            return seconds / 1000 if name == "retry-after-ms" else seconds
+    return VISION_RETRY_BASE * 2 ** attempt + random.uniform(0, VISION_RETRY_BASE)
+
+
+# ----------------------------------------
+# Payload compaction
+# ----------------------------------------
+def crop_margins(img: Image.Image) -> Image.Image:
+    """Crop blank (near-white) borders, keeping a small padding."""
+    gray = np.asarray(img.convert("L"))
+    ink = gray < CROP_INK_LEVEL
+    rows = np.flatnonzero(ink.any(axis=1))
+    cols = np.flatnonzero(ink.any(axis=0))
+    if rows.size == 0 or cols.size == 0:
+        return img
+    top = max(0, rows[0] - CROP_PADDING)
+    bottom = min(img.height, rows[-1] + 1 + CROP_PADDING)
+    left = max(0, cols[0] - CROP_PADDING)
+    right = min(img.width, cols[-1] + 1 + CROP_PADDING)
+    if (right - left) * (bottom - top) >= 0.95 * img.width * img.height:
+        return img
+    return img.crop((left, top, right, bottom))
+
+
+def tile_tall(img: Image.Image, page_width: int = None,
+              aspect: float = VISION_TILE_ASPECT) -> list:
+    """
+    Split an image taller than `aspect` × page width into overlapping
+    full-width tiles. `page_width` is the width before margin cropping,
+    so a narrow column of text is not cut into many small strips.
+    """
+    tile_h = int((page_width or img.width) * aspect)
+    if aspect <= 0 or img.height <= tile_h:
+        return [img]
+    step = max(1, tile_h - TILE_OVERLAP)
+    tiles = []
+    for top in range(0, img.height, step):
+        tiles.append(img.crop((0, top, img.width, min(img.height, top + tile_h))))
+        if top + tile_h >= img.height:
+            break
+    return tiles
+
+
+def encode_image(img: Image.Image, fmt: str = VISION_FORMAT,
+                 quality: int = VISION_QUALITY) -> tuple:
+    """(bytes, mime); lowers the quality until under VISION_MAX_PART_KB."""
+    if fmt == "png":
+        buf = io.BytesIO()
+        img.save(buf, format="PNG")
+        return buf.getvalue(), "image/png"
+
+    if img.mode not in ("L", "RGB"):
+        img = img.convert("RGB")
+    while True:
+        buf = io.BytesIO()
+        img.save(buf, format=fmt.upper(), quality=quality)
+        data = buf.getvalue()
+        if (not VISION_MAX_PART_KB or len(data) <= VISION_MAX_PART_KB * 1024
+                or quality <= VISION_MIN_QUALITY):
+            return data, f"image/{fmt}"
+        quality = max(VISION_MIN_QUALITY, quality - 10)
+
+
+def compact_image(image) -> dict:
+    """
+    Vision payload for a PIL image or encoded image bytes:
+    {"parts": [(bytes, mime), ...], "input_bytes", "input_kind", "bytes", "size"}.
+    `input_kind` is "encoded" (file size) or "raster" (uncompressed
+    w×h×bands of a PIL image, not comparable with an encoded file).
+    The caller owns `image`; the result does not reference it.
+    """
+    if isinstance(image, (bytes, bytearray)):
+        input_bytes, input_kind = len(image), "encoded"
+        image = Image.open(io.BytesIO(image))
+    else:
+        input_bytes, input_kind = image.width * image.height * len(image.getbands()), "raster"
+
+    img = image.convert("L") if VISION_GRAYSCALE else image
+    if VISION_CROP_MARGINS:
+        img = crop_margins(img)
+    parts = [encode_image(tile) for tile in tile_tall(img, image.width)]
+    return {
+        "parts": parts,
+        "input_bytes": input_bytes,
+        "input_kind": input_kind,
+        "bytes": sum(len(data) for data, _ in parts),
+        "size": img.size,
+    }
+
+
+# ----------------------------------------
+# Requests
+# ----------------------------------------
+def vision_ocr(image) -> str:
+    """
+    OCR one image with Vision. `image` is encoded bytes, a PIL image or
+    a compact_image() payload. Retries 429 / 5xx / connection errors
+    through the shared limiter; returns "" once retries are exhausted.
+    """
+    payload = image if isinstance(image, dict) else compact_image(image)
+    parts = payload["parts"]
+    print(f"[DEBUG] Vision payload: {payload['input_bytes']} {payload['input_kind']} → "
+          f"{payload['bytes']} encoded bytes "
+          f"({len(parts)} part(s), {payload['size'][0]}x{payload['size'][1]})")
+
+    prompt = "Extract all text from this image."
+    if len(parts) > 1:
+        prompt = ("Extract all text from this page. The images are consecutive, slightly "
+                  "overlapping strips from top to bottom; do not repeat overlapping lines.")
+    content = [{"type": "text", "text": prompt}]
+    for data, mime in parts:
+        b64 = base64.b64encode(data).decode("utf-8")
+        content.append({"type": "image_url", "image_url": {"url": f"data:{mime};base64,{b64}"}})
+    messages = [{"role": "user", "content": content}]
+
+    for attempt in range(VISION_MAX_RETRIES + 1):
+        limiter.acquire()
+        try:
+            response = client.chat.completions.create(
+                model=VISION_MODEL,
+                messages=messages,
+                max_tokens=2000,
+            )
+            limiter.success()
+            return response.choices[0].message.content or ""
+        except openai.RateLimitError as e:
+            delay = _retry_after(e, attempt)
+            # Το throttle ισχύει για όλους τους workers, και μετά την τελευταία προσπάθεια
+            limiter.throttle(delay)
+            if attempt < VISION_MAX_RETRIES:
+                print(f"[WARN] Vision 429, retry {attempt + 1} in {delay:.1f}s")
+        except (openai.APIConnectionError, openai.InternalServerError) as e:
+            if attempt < VISION_MAX_RETRIES:
+                delay = _retry_after(e, attempt)
+                print(f"[WARN] Vision request failed ({e.__class__.__name__}), retry {attempt + 1} in {delay:.1f}s")
+                time.sleep(delay)
+        except Exception as e:
+            print(f"[ERROR] OpenAI OCR failed: {e}")
+            return ""
+
+    print(f"[ERROR] OpenAI OCR failed after {VISION_MAX_RETRIES} retries")
+    return ""
+
+
+def vision_ocr_many(images) -> list:
+    """
+    OCR an iterable of images concurrently (bounded by VISION_CONCURRENCY);
+    texts are returned in input order. Items are anything vision_ocr()
+    accepts; PIL images must stay valid until the call returns, so pass
+    compact_image() payloads for short-lived rasters.
+    """
+    futures = [vision_executor.submit(vision_ocr, item) for item in images]
+    return [f.result() for f in futures]
@@ -0,0 +1,139 @@
+from pathlib import Path
+
+from core.executors import get_cpu_executor
+from core.jobs.stages import Stage, run_stage_graph
+from core.ocr.invoice_ocr import ocr_document
+from core.ocr.pdf_text import extract_pdf_text
+from core.integrations.rag_adapter import rag_add_document
+from core.invoice.parser import parse_invoice_text
+from core.storage.blob_store import blob_catalog
+
+
+# ----------------------------------------
+# INVOICE PIPELINE
+#   ocr ─┬─> index  (RAG add)
+#        └─> parse  (LLM)      index & parse τρέχουν παράλληλα
+# ----------------------------------------
+def _has_invoice_text(results: dict) -> bool:
+    return len((results.get("ocr") or "").strip()) >= 20
+
+
+def _index_document(text: str, filename: str, doc_type: str, collection: str,
+                    content_hash: str = None, document_id: str = None) -> dict:
+    """RAG add, skipped when the catalog says this content is already indexed."""
+    if content_hash:
+        doc = blob_catalog.get_document(content_hash, collection)
+        if doc and doc["status"] == "indexed":
+            return {"status": "already_indexed", "document_id": doc["document_id"],
+                    "chunks": doc["chunks"]}
+
+    metadata = {"filename": filename, "type": doc_type}
+    if content_hash:
+        metadata["content_hash"] = content_hash
+    rag_result = rag_add_document(
+        text=text,
+        metadata=metadata,
+        collection=collection,
+        document_id=document_id
+    )
+    if rag_result.get("status") == "error":
+        raise RuntimeError(f"RAG add failed: {rag_result.get('message')}")
+    # Μερικό add (chunks χωρίς embedding) → retry· upsert με ίδια ids, χωρίς διπλά
+    if rag_result.get("failed_chunks"):
+        raise RuntimeError(f"RAG add incomplete: {rag_result['failed_chunks']} chunk(s) not embedded")
+    if content_hash and document_id:
+        blob_catalog.mark_indexed(content_hash, collection, document_id, rag_result["chunks"])
+    return rag_result
+
+
+def _ocr_invoice(path: str, filename: str, ctx, preprocess: bool = None,
+                 content_hash: str = None) -> str:
+    # Το hash έρχεται από το upload → το αρχείο δεν ξαναδιαβάζεται για hashing
+    ocr = ocr_document(path, filename, content_hash=content_hash, preprocess=preprocess)
+    ctx.report("ocr", pages=ocr["pages"], engines=ocr["engines"])
+    return ocr["text"]
+
+
+def run_invoice_pipeline(payload: dict, ctx) -> dict:
+    path = payload["path"]
+    filename = payload["filename"]
+    content_hash = payload.get("content_hash")
+    document_id = payload.get("document_id")
+
+    stages = [
+        Stage("ocr", lambda r: _ocr_invoice(path, filename, ctx, payload.get("preprocess"),
+                                            content_hash)),
+        # Σε retry δεν ξαναπροσθέτουμε τα ίδια chunks
+        Stage("index", lambda r: _index_document(r["ocr"], filename, "invoice", "invoices",
+                                                 content_hash, document_id),
+              deps=("ocr",), when=_has_invoice_text, rerun=False),
+        Stage("parse", lambda r: parse_invoice_text(r["ocr"]),
+              deps=("ocr",), when=_has_invoice_text),
+    ]
+    results, timings = run_stage_graph(stages, ctx)
+    text = results["ocr"]
+
+    if not _has_invoice_text(results):
+        return {
+            "status": "error",
+            "message": "OCR failed: too little text",
+            "ocr_preview": text,
+            "timings": timings
+        }
+
+    return {
+        "status": "ok",
+        "filename": filename,
+        "ocr_preview": text[:2000],
+        "parsed_invoice": results["parse"],
+        "timings": timings
+    }
+
+
+# ----------------------------------------
+# GENERAL PIPELINE: text extraction → RAG add
+# ----------------------------------------
+def run_general_pipeline(payload: dict, ctx) -> dict:
+    path = payload["path"]
+    filename = payload["filename"]
+
+    with ctx.stage("extract"):
+        text = ""
+        if filename.lower().endswith(".pdf"):
+            try:
+                # pdfplumber είναι CPU-bound → process pool
+                text = get_cpu_executor().submit(extract_pdf_text, path).result()
+                print(f"📄 PDF extracted {len(text)} characters")
+            except Exception as e:
+                print(f"PDF extraction error: {e}")
+                text = "PDF extraction failed"
+        else:
+            # Για txt αρχεία
+            text = Path(path).read_bytes().decode("utf-8", errors="ignore")
+        ctx.report("extract", text_length=len(text))
+
+    # Αν το κείμενο είναι πολύ μικρό, προειδοποίηση
+    if len(text.strip()) < 10:
+        return {
+            "status": "warning",
+            "message": "Little or no text extracted from file",
+            "filename": filename,
+            "text_preview": text[:200] if text else ""
+        }
+
+    with ctx.stage("index"):
+        rag_result = _index_document(text, filename, "general", "general",
+                                     payload.get("content_hash"), payload.get("document_id"))
+
+    return {
+        "status": "ok",
+        "filename": filename,
+        "text_length": len(text),
+        "rag_result": rag_result
+    }
+
+
+JOB_HANDLERS = {
+    "invoice": run_invoice_pipeline,
+    "general": run_general_pipeline,
+}
@@ -0,0 +1,170 @@
+# core/storage/blob_store.py
+"""
+Content-addressed upload storage.
+
+Every uploaded file is stored once, at blobs/<h[:2]>/<h[2:4]>/<sha256>,
+no matter how many times or under which names it is uploaded. A SQLite
+catalog records filename → hash for every upload and, per collection,
+which content has already been indexed (document id, chunks, job), so a
+re-upload can be answered without OCR or embedding work.
+
+uploads/<kind>/<filename> is kept as a hard link to the latest blob
+with that name, for browsing only.
+"""
+import os
+import time
+import uuid
+import shutil
+import sqlite3
+import threading
+from pathlib import Path
+
+# ----------------------------------------
+# Settings
+# ----------------------------------------
+UPLOAD_ROOT = Path(os.getenv("UPLOAD_ROOT", "uploads"))
+BLOB_DIR = Path(os.getenv("BLOB_DIR", str(UPLOAD_ROOT / "blobs")))
+BLOB_CATALOG_PATH = Path(os.getenv("BLOB_CATALOG_PATH", str(UPLOAD_ROOT / "catalog.sqlite3")))
+
+
+# ----------------------------------------
+# Blob files
+# ----------------------------------------
+class BlobStore:
+    """sha256-addressed files, sharded in two directory levels."""
+
+    def __init__(self, root: Path = BLOB_DIR):
+        self.root = root
+        self.tmp_dir = root / "tmp"
+        self.tmp_dir.mkdir(parents=True, exist_ok=True)
+
+    def path_for(self, content_hash: str) -> Path:
+        return self.root / content_hash[:2] / content_hash[2:4] / content_hash
+
+    def tmp_path(self) -> Path:
+        """Scratch file on the same filesystem (rename into place is atomic)."""
+        return self.tmp_dir / uuid.uuid4().hex
+
+    def put(self, tmp_path: Path, content_hash: str) -> Path:
+        """Move a fully written file into place; an existing blob wins."""
+        target = self.path_for(content_hash)
+        if target.exists():
+            Path(tmp_path).unlink(missing_ok=True)
+            return target
+        target.parent.mkdir(parents=True, exist_ok=True)
+        os.replace(tmp_path, target)
+        return target
+
+    def link_name(self, content_hash: str, kind: str, filename: str) -> Path:
+        """uploads/<kind>/<filename> → blob (hard link, copy if links are unsupported)."""
+        view = UPLOAD_ROOT / kind / Path(filename).name
+        view.parent.mkdir(parents=True, exist_ok=True)
+        tmp = view.with_name(f".{view.name}.{uuid.uuid4().hex[:8]}")
+        try:
+            os.link(self.path_for(content_hash), tmp)
+        except OSError:
+            shutil.copyfile(self.path_for(content_hash), tmp)
+        os.replace(tmp, view)
+        return view
+
+
+# ----------------------------------------
+# Catalog (SQLite)
+# ----------------------------------------
+class BlobCatalog:
+    """Filename → hash history and per-collection document records."""
+
+    def __init__(self, path: Path = BLOB_CATALOG_PATH):
+        path.parent.mkdir(parents=True, exist_ok=True)
+        self.path = path
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(str(path), check_same_thread=False, isolation_level=None)
+        self._conn.row_factory = sqlite3.Row
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS names ("
+            " kind TEXT NOT NULL,"
+            " filename TEXT NOT NULL,"
+            " content_hash TEXT NOT NULL,"
+            " size INTEGER NOT NULL,"
+            " uploads INTEGER NOT NULL DEFAULT 1,"
+            " first_seen REAL NOT NULL,"
+            " last_seen REAL NOT NULL,"
+            " PRIMARY KEY (kind, filename, content_hash))"
+        )
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS documents ("
+            " content_hash TEXT NOT NULL,"
+            " collection TEXT NOT NULL,"
+            " document_id TEXT NOT NULL,"
+            " status TEXT NOT NULL,"          # pending | indexed
+            " job_id TEXT,"
+            " chunks INTEGER,"
+            " updated_at REAL NOT NULL,"
+            " PRIMARY KEY (content_hash, collection))"
+        )
+
+    # -------------------- names --------------------
+    def record_name(self, kind: str, filename: str, content_hash: str, size: int):
+        now = time.time()
+        with self._lock:
+            self._conn.execute(
+                "INSERT INTO names (kind, filename, content_hash, size, first_seen, last_seen)"
+                " VALUES (?, ?, ?, ?, ?, ?)"
+                " ON CONFLICT (kind, filename, content_hash)"
+                " DO UPDATE SET uploads = uploads + 1, last_seen = excluded.last_seen",
+                (kind, filename, content_hash, size, now, now)
+            )
+
+    def hashes(self, kind: str) -> list:
+        """[(content_hash, latest filename)] of every blob uploaded as `kind`."""
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT n.content_hash, n.filename FROM names n"
+                " JOIN (SELECT content_hash, MIN(first_seen) AS first, MAX(last_seen) AS last"
+                "       FROM names WHERE kind = ? GROUP BY content_hash) g"
+                " ON n.content_hash = g.content_hash AND n.last_seen = g.last"
+                " WHERE n.kind = ? GROUP BY n.content_hash ORDER BY g.first",
+                (kind, kind)
+            ).fetchall()
+        return [(r["content_hash"], r["filename"]) for r in rows]
+
+    # -------------------- documents --------------------
+    def get_document(self, content_hash: str, collection: str):
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT * FROM documents WHERE content_hash = ? AND collection = ?",
+                (content_hash, collection)
+            ).fetchone()
+        return dict(row) if row else None
+
+    def mark_pending(self, content_hash: str, collection: str, document_id: str, job_id: str):
+        with self._lock:
+            # Ένα ήδη indexed document μένει indexed (νέο job μόνο για τα υπόλοιπα stages)
+            self._conn.execute(
+                "INSERT INTO documents (content_hash, collection, document_id, status, job_id,"
+                " updated_at) VALUES (?, ?, ?, 'pending', ?, ?)"
+                " ON CONFLICT (content_hash, collection) DO UPDATE SET job_id = excluded.job_id,"
+                " updated_at = excluded.updated_at",
+                (content_hash, collection, document_id, job_id, time.time())
+            )
+
+    def mark_indexed(self, content_hash: str, collection: str, document_id: str, chunks: int):
+        with self._lock:
+            self._conn.execute(
+                "INSERT INTO documents (content_hash, collection, document_id, status, chunks,"
+                " updated_at) VALUES (?, ?, ?, 'indexed', ?, ?)"
+                " ON CONFLICT (content_hash, collection) DO UPDATE SET status = 'indexed',"
+                " document_id = excluded.document_id, chunks = excluded.chunks,"
+                " updated_at = excluded.updated_at",
+                (content_hash, collection, document_id, chunks, time.time())
+            )
+
+
+def document_id_for(content_hash: str) -> str:
+    """Stable document id: same content → same Chroma chunk ids."""
+    return content_hash[:32]
+
+
+blob_store = BlobStore()
+blob_catalog = BlobCatalog()
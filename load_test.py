@@ -0,0 +1,131 @@
+# load_test.py
+"""
+Concurrency check: latency of /health and search while uploads run.
+
+Usage (backend must be running):
+    python load_test.py --file sample_invoice.pdf --uploaders 4 --duration 60
+"""
+import argparse
+import statistics
+import threading
+import time
+import uuid
+from pathlib import Path
+
+import requests
+
+
+def percentile(values, pct):
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    idx = min(len(ordered) - 1, int(round(pct / 100 * (len(ordered) - 1))))
+    return ordered[idx]
+
+
+def unique_payload(data: bytes, suffix: str) -> bytes:
+    """
+    Same document, different bytes: duplicate suppression and the OCR cache
+    key on the content hash, so a repeated upload would create no load.
+    Trailing bytes after %%EOF / IEND / EOI are ignored by the readers.
+    """
+    nonce = uuid.uuid4().hex.encode("ascii")
+    if suffix == ".pdf":
+        return data + b"\n% load-test " + nonce + b"\n"
+    return data + nonce
+
+
+def uploader(api, path, endpoint, stop, counters):
+    path = Path(path)
+    data = path.read_bytes()
+    while not stop.is_set():
+        try:
+            resp = requests.post(
+                f"{api}/{endpoint}",
+                files={"file": (path.name, unique_payload(data, path.suffix.lower()))},
+                timeout=600,
+            )
+            counters["uploads"] += 1
+            if resp.status_code == 200 and resp.json().get("status") == "duplicate":
+                counters["duplicates"] += 1
+        except Exception as e:
+            counters["upload_errors"] += 1
+            print(f"⚠️ Upload error: {e}")
+
+
+def prober(api, method, route, payload, stop, samples, interval):
+    while not stop.is_set():
+        start = time.perf_counter()
+        try:
+            if method == "GET":
+                requests.get(f"{api}{route}", timeout=30)
+            else:
+                requests.post(f"{api}{route}", json=payload, timeout=30)
+            samples.append((time.perf_counter() - start) * 1000)
+        except Exception:
+            samples.append(30_000.0)
+        time.sleep(interval)
+
+
+def report(name, samples):
+    if not samples:
+        print(f"{name:<18} no samples")
+        return
+    print(
+        f"{name:<18} n={len(samples):<5} "
+        f"p50={statistics.median(samples):8.1f}ms "
+        f"p95={percentile(samples, 95):8.1f}ms "
+        f"p99={percentile(samples, 99):8.1f}ms "
+        f"max={max(samples):8.1f}ms"
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description="AInteG latency under ingestion load")
+    parser.add_argument("--api", default="http://127.0.0.1:8001")
+    parser.add_argument("--file", required=True, help="file to upload repeatedly (made unique per upload)")
+    parser.add_argument("--endpoint", default="invoices/upload")
+    parser.add_argument("--uploaders", type=int, default=4)
+    parser.add_argument("--duration", type=float, default=60.0)
+    parser.add_argument("--interval", type=float, default=0.1)
+    parser.add_argument("--query", default="σύνολο τιμολογίου")
+    args = parser.parse_args()
+
+    stop = threading.Event()
+    counters = {"uploads": 0, "duplicates": 0, "upload_errors": 0}
+    health, search = [], []
+
+    threads = [
+        threading.Thread(target=prober, args=(args.api, "GET", "/health", None, stop, health, args.interval)),
+        threading.Thread(target=prober, args=(args.api, "POST", "/general/search",
+                                              {"query": args.query, "top_k": 3}, stop, search, args.interval)),
+    ]
+    # Baseline χωρίς φορτίο
+    for t in threads:
+        t.start()
+    time.sleep(min(5.0, args.duration / 4))
+    baseline = {"health": list(health), "search": list(search)}
+    health.clear()
+    search.clear()
+
+    for _ in range(args.uploaders):
+        t = threading.Thread(target=uploader, args=(args.api, args.file, args.endpoint, stop, counters))
+        t.start()
+        threads.append(t)
+
+    time.sleep(args.duration)
+    stop.set()
+    for t in threads:
+        t.join(timeout=1)
+
+    print("=== Baseline (idle) ===")
+    report("/health", baseline["health"])
+    report("/general/search", baseline["search"])
+    print(f"=== Under load ({args.uploaders} uploaders, {counters['uploads']} uploads, "
+          f"{counters['duplicates']} duplicates, {counters['upload_errors']} errors) ===")
+    report("/health", health)
+    report("/general/search", search)
+
+
+if __name__ == "__main__":
+    main()
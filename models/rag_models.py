@@ -1,5 +1,25 @@
+from typing import List, Optional
+
 from pydantic import BaseModel
 
 class QueryRequest(BaseModel):
     query: str
     top_k: int = 3
+
+
+class BatchQuery(BaseModel):
+    query: str
+    collection: str = "general"
+    top_k: int = 3
+    filters: Optional[dict] = None
+
+
+class BatchSearchRequest(BaseModel):
+    queries: List[BatchQuery]
+
+
+class FederatedSearchRequest(BaseModel):
+    query: str
+    collections: List[str] = ["general", "invoices"]
+    top_k: int = 3
+    filters: Optional[dict] = None
@@ -125,6 +125,31 @@ with st.sidebar:
     else:
         st.session_state.api_url = API_URL
 
+# =====================================
+# JOB POLLING (background ingestion)
+# =====================================
+def wait_for_job(job_id: str, status=None, timeout: int = 600):
+    """Poll /jobs/{id} until the background job finishes."""
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        resp = requests.get(f"{API_URL}/jobs/{job_id}", timeout=10)
+        if resp.status_code != 200:
+            return {"status": "error", "message": f"HTTP {resp.status_code}: {resp.text[:200]}"}
+
+        job = resp.json()
+        if job["status"] == "done":
+            return job.get("result") or {"status": "error", "message": "Empty job result"}
+        if job["status"] == "failed":
+            return {"status": "error", "message": (job.get("error") or "Job failed").splitlines()[0]}
+
+        if status is not None:
+            running = [name for name, info in job.get("stages", {}).items() if info.get("status") == "running"]
+            stage_text = f" ({', '.join(running)})" if running else ""
+            status.info(f"⚙️ Επεξεργασία{stage_text}... προσπάθεια {job.get('attempts', 0)}")
+        time.sleep(1)
+
+    return {"status": "error", "message": f"⏰ Η επεξεργασία δεν ολοκληρώθηκε σε {timeout}s (job {job_id})"}
+
 # =====================================
 # SIMPLE UPLOAD FUNCTION
 # =====================================
@@ -160,10 +185,23 @@ def simple_upload(file, endpoint):
             timeout=timeout
         )
         
+        if response.status_code == 202:
+            # Το backend επιστρέφει job id → περιμένουμε το αποτέλεσμα
+            result = wait_for_job(response.json()["job_id"], status=status)
+            response_ok = True
+        elif response.status_code == 200 and response.json().get("status") == "duplicate":
+            # Ίδιο περιεχόμενο ήδη ανεβασμένο → αποτέλεσμα του αρχικού job
+            duplicate = response.json()
+            result = wait_for_job(duplicate["job_id"], status=status) if duplicate.get("job_id") else {"status": "ok"}
+            result = {**result, "duplicate": duplicate}
+            response_ok = True
+        else:
+            result = response.json() if response.status_code == 200 else None
+            response_ok = response.status_code == 200
+        
         status.empty()
         
-        if response.status_code == 200:
-            result = response.json()
+        if response_ok:
             status_value = result.get("status")
             
             # ΑΥΤΗ είναι η σωστή έλεγξη:
@@ -190,12 +228,20 @@ def enhanced_rag_chat(scope: str, query: str, top_k: int = 3, chat_history=None)
     """Enhanced RAG chat with better context handling"""
     try:
         # Search for documents
-        endpoint = f"{API_URL}/{scope}/search"
-        resp = requests.post(
-            endpoint, 
-            json={"query": query, "top_k": top_k}, 
-            timeout=30
-        )
+        if scope == "all":
+            # Ένα request για όλες τις συλλογές (federated search)
+            resp = requests.post(
+                f"{API_URL}/search/federated",
+                json={"query": query, "top_k": top_k, "collections": ["general", "invoices"]},
+                timeout=30
+            )
+        else:
+            endpoint = f"{API_URL}/{scope}/search"
+            resp = requests.post(
+                endpoint, 
+                json={"query": query, "top_k": top_k}, 
+                timeout=30
+            )
         
         if resp.status_code != 200:
             return {
@@ -400,6 +446,7 @@ if mode == "Γενικά Έγγραφα":
                                     st.divider()
         
         # Εισαγωγή χρήστη
+        search_all = st.checkbox("🔀 Αναζήτηση και στα τιμολόγια", key="general_search_all")
         user_input = st.chat_input("Ρωτήστε κάτι για τα έγγραφά σας...")
         
         if user_input:
@@ -416,7 +463,7 @@ if mode == "Γενικά Έγγραφα":
                     try:
                         # Χρήση enhanced RAG chat
                         result = enhanced_rag_chat(
-                            "general", 
+                            "all" if search_all else "general", 
                             user_input, 
                             top_k=3,
                             chat_history=st.session_state.general_chat
@@ -562,6 +609,7 @@ else:  # Τιμολόγια
                                     st.divider()
         
         # Εισαγωγή χρήστη
+        search_all = st.checkbox("🔀 Αναζήτηση και στα γενικά έγγραφα", key="invoice_search_all")
         user_input = st.chat_input("Ρωτήστε κάτι για τα τιμολόγιά σας...")
         
         if user_input:
@@ -578,7 +626,7 @@ else:  # Τιμολόγια
                     try:
                         # Χρήση enhanced RAG chat
                         result = enhanced_rag_chat(
-                            "invoices", 
+                            "all" if search_all else "invoices", 
                             user_input, 
                             top_k=3,
                             chat_history=st.session_state.invoice_chat
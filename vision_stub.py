@@ -0,0 +1,116 @@
+# vision_stub.py
+"""
+Local stand-in for the OpenAI chat completions endpoint, to exercise the
+Vision fan-out and rate limiter without spending tokens.
+
+Every request sleeps for --latency seconds (± jitter). More than --rps
+requests in any one-second window get a 429 with Retry-After, and
+--error-rate of the rest fail with 500.
+
+Usage:
+    python vision_stub.py --port 8089 --latency 1.5 --rps 3
+    VISION_BASE_URL=http://127.0.0.1:8089/v1 python bench_vision.py invoice.pdf ...
+"""
+import json
+import time
+import random
+import argparse
+import threading
+from collections import deque
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+
+class StubState:
+    def __init__(self, rps: int, retry_after: float):
+        self.rps = rps
+        self.retry_after = retry_after
+        self.window = deque()
+        self.counts = {"ok": 0, "429": 0, "500": 0}
+        self.lock = threading.Lock()
+
+    def admit(self) -> bool:
+        now = time.monotonic()
+        with self.lock:
+            while self.window and now - self.window[0] > 1.0:
+                self.window.popleft()
+            if len(self.window) >= self.rps:
+                self.counts["429"] += 1
+                return False
+            self.window.append(now)
+            return True
+
+
+def make_handler(state: StubState, latency: float, jitter: float, error_rate: float):
+    class Handler(BaseHTTPRequestHandler):
+        def _send(self, status: int, body: dict, headers: dict = None):
+            data = json.dumps(body).encode("utf-8")
+            self.send_response(status)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(data)))
+            for name, value in (headers or {}).items():
+                self.send_header(name, value)
+            self.end_headers()
+            self.wfile.write(data)
+
+        def do_POST(self):
+            length = int(self.headers.get("Content-Length", 0))
+            request = json.loads(self.rfile.read(length) or b"{}")
+
+            if not state.admit():
+                self._send(429, {"error": {"message": "Rate limit reached", "type": "requests"}},
+                           {"Retry-After": str(state.retry_after)})
+                return
+
+            time.sleep(max(0.0, latency + random.uniform(-jitter, jitter)))
+
+            if random.random() < error_rate:
+                with state.lock:
+                    state.counts["500"] += 1
+                self._send(500, {"error": {"message": "Simulated server error"}})
+                return
+
+            with state.lock:
+                state.counts["ok"] += 1
+            self._send(200, {
+                "id": f"chatcmpl-stub-{random.getrandbits(32):08x}",
+                "object": "chat.completion",
+                "created": int(time.time()),
+                "model": request.get("model", "stub"),
+                "choices": [{
+                    "index": 0,
+                    "message": {"role": "assistant", "content": "ΤΙΜΟΛΟΓΙΟ stub OCR text 123,45"},
+                    "finish_reason": "stop",
+                }],
+                "usage": {"prompt_tokens": 0, "completion_tokens": 0, "total_tokens": 0},
+            })
+
+        def log_message(self, fmt, *args):
+            pass
+
+    return Handler
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Stub Vision endpoint with latency and rate limits")
+    parser.add_argument("--port", type=int, default=8089)
+    parser.add_argument("--latency", type=float, default=1.0)
+    parser.add_argument("--jitter", type=float, default=0.3)
+    parser.add_argument("--rps", type=int, default=3)
+    parser.add_argument("--retry-after", type=float, default=1.0)
+    parser.add_argument("--error-rate", type=float, default=0.0)
+    args = parser.parse_args()
+
+    state = StubState(args.rps, args.retry_after)
+    server = ThreadingHTTPServer(("127.0.0.1", args.port),
+                                 make_handler(state, args.latency, args.jitter, args.error_rate))
+    print(f"Vision stub on http://127.0.0.1:{args.port}/v1 (latency {args.latency}s, {args.rps} rps)")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        print(f"Responses: {state.counts}")
+
+
+if __name__ == "__main__":
+    main()